@@ -0,0 +1,164 @@
+import os
+import math
+import time
+from collections import Counter, namedtuple
+
+# Sliding window the activity is measured over, split into fixed buckets
+ACTIVITY_WINDOW_SECONDS = float(os.getenv('ACTIVITY_WINDOW_SECONDS', '60'))
+ACTIVITY_BUCKETS = int(os.getenv('ACTIVITY_BUCKETS', '12'))
+
+# Absolute thresholds; 0 disables a threshold
+ACTIVITY_MIN_BUYS = int(os.getenv('ACTIVITY_MIN_BUYS', '0'))
+ACTIVITY_MIN_VOLUME = float(os.getenv('ACTIVITY_MIN_VOLUME', '0'))
+ACTIVITY_MIN_UNIQUE_BUYERS = int(os.getenv('ACTIVITY_MIN_UNIQUE_BUYERS', '0'))
+
+# Z-score of the window volume against its EWMA baseline; 0 disables it
+ACTIVITY_Z_SCORE = float(os.getenv('ACTIVITY_Z_SCORE', '4'))
+ACTIVITY_EWMA_ALPHA = float(os.getenv('ACTIVITY_EWMA_ALPHA', '0.05'))
+
+# Windows of history needed before the z-score is trusted
+ACTIVITY_WARMUP_WINDOWS = int(os.getenv('ACTIVITY_WARMUP_WINDOWS', '5'))
+
+# Floor on trades in the window before any alert fires, and per-mint alert cooldown
+ACTIVITY_MIN_TRADES = int(os.getenv('ACTIVITY_MIN_TRADES', '5'))
+ACTIVITY_COOLDOWN_SECONDS = float(os.getenv('ACTIVITY_COOLDOWN_SECONDS', '300'))
+
+ActivitySnapshot = namedtuple(
+    'ActivitySnapshot',
+    ['mint', 'window_seconds', 'buys', 'sells', 'buy_volume', 'sell_volume', 'unique_buyers', 'z_score'],
+)
+
+
+class MintActivity:
+    """Ring buffer of time buckets for one mint, with running window totals.
+
+    Recording a trade and reading the window totals are O(1); an expired
+    bucket is subtracted from the totals and folded into an EWMA baseline
+    of per-bucket volume as the window slides past it.
+    """
+
+    def __init__(self, window_seconds, buckets, alpha):
+        self.bucket_seconds = window_seconds / buckets
+        self.size = buckets
+        self.alpha = alpha
+        self.head = None
+        self.buys = [0] * buckets
+        self.sells = [0] * buckets
+        self.buy_volume = [0.0] * buckets
+        self.sell_volume = [0.0] * buckets
+        self.buyers = [None] * buckets
+        self.total_buys = 0
+        self.total_sells = 0
+        self.total_buy_volume = 0.0
+        self.total_sell_volume = 0.0
+        self.unique_buyers = Counter()
+        # EWMA of per-bucket volume and its variance
+        self.mean = 0.0
+        self.variance = 0.0
+        self.baseline_buckets = 0
+        self.last_alert = None
+
+    def _expire(self, slot):
+        volume = self.buy_volume[slot] + self.sell_volume[slot]
+        self.total_buys -= self.buys[slot]
+        self.total_sells -= self.sells[slot]
+        self.total_buy_volume -= self.buy_volume[slot]
+        self.total_sell_volume -= self.sell_volume[slot]
+        if self.buyers[slot]:
+            self.unique_buyers.subtract(self.buyers[slot])
+            for buyer in self.buyers[slot]:
+                if self.unique_buyers[buyer] <= 0:
+                    del self.unique_buyers[buyer]
+        self.buys[slot] = self.sells[slot] = 0
+        self.buy_volume[slot] = self.sell_volume[slot] = 0.0
+        self.buyers[slot] = None
+        return volume
+
+    def _fold_baseline(self, volume):
+        diff = volume - self.mean
+        self.mean += self.alpha * diff
+        self.variance = (1 - self.alpha) * (self.variance + self.alpha * diff * diff)
+        self.baseline_buckets += 1
+
+    def _advance(self, bucket):
+        if self.head is None:
+            self.head = bucket
+            return
+        # Idle stretches longer than the window only need to be folded as zeros a bounded number of times
+        steps = min(bucket - self.head, 4 * self.size)
+        for _ in range(steps):
+            self.head += 1
+            self._fold_baseline(self._expire(self.head % self.size))
+        self.head = max(self.head, bucket)
+
+    def record(self, side, amount, trader, timestamp):
+        bucket = int(timestamp // self.bucket_seconds)
+        self._advance(bucket)
+        if bucket <= self.head - self.size:
+            return  # Older than the window
+        slot = bucket % self.size
+        if side == 'buy':
+            self.buys[slot] += 1
+            self.buy_volume[slot] += amount
+            self.total_buys += 1
+            self.total_buy_volume += amount
+            if trader is not None:
+                if self.buyers[slot] is None:
+                    self.buyers[slot] = set()
+                if trader not in self.buyers[slot]:
+                    self.buyers[slot].add(trader)
+                    self.unique_buyers[trader] += 1
+        else:
+            self.sells[slot] += 1
+            self.sell_volume[slot] += amount
+            self.total_sells += 1
+            self.total_sell_volume += amount
+
+    def z_score(self):
+        if self.baseline_buckets < ACTIVITY_WARMUP_WINDOWS * self.size:
+            return None  # Baseline still warming up
+        window_volume = self.total_buy_volume + self.total_sell_volume
+        expected = self.mean * self.size
+        spread = math.sqrt(self.variance * self.size)
+        if spread == 0:
+            return math.inf if window_volume > expected else 0.0
+        return (window_volume - expected) / spread
+
+
+class ActivityDetector:
+    """Streaming per-mint buy/sell aggregation that only reports threshold or z-score crossings."""
+
+    def __init__(self, window_seconds=ACTIVITY_WINDOW_SECONDS, buckets=ACTIVITY_BUCKETS, alpha=ACTIVITY_EWMA_ALPHA):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.alpha = alpha
+        self.mints = {}
+
+    def record(self, mint, side, amount, trader=None, timestamp=None):
+        """Add one trade; returns an ActivitySnapshot when it pushes the mint over a threshold."""
+        timestamp = timestamp if timestamp is not None else time.time()
+        activity = self.mints.get(mint)
+        if activity is None:
+            activity = self.mints[mint] = MintActivity(self.window_seconds, self.buckets, self.alpha)
+        activity.record(side, amount, trader, timestamp)
+
+        if activity.total_buys + activity.total_sells < ACTIVITY_MIN_TRADES:
+            return None
+        if activity.last_alert is not None and timestamp - activity.last_alert < ACTIVITY_COOLDOWN_SECONDS:
+            return None
+
+        z_score = activity.z_score()
+        crossed = (
+            (ACTIVITY_MIN_BUYS and activity.total_buys >= ACTIVITY_MIN_BUYS)
+            or (ACTIVITY_MIN_VOLUME and activity.total_buy_volume + activity.total_sell_volume >= ACTIVITY_MIN_VOLUME)
+            or (ACTIVITY_MIN_UNIQUE_BUYERS and len(activity.unique_buyers) >= ACTIVITY_MIN_UNIQUE_BUYERS)
+            or (ACTIVITY_Z_SCORE and z_score is not None and z_score >= ACTIVITY_Z_SCORE)
+        )
+        if not crossed:
+            return None
+
+        activity.last_alert = timestamp
+        return ActivitySnapshot(
+            mint, self.window_seconds, activity.total_buys, activity.total_sells,
+            activity.total_buy_volume, activity.total_sell_volume, len(activity.unique_buyers), z_score,
+        )
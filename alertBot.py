@@ -0,0 +1,64 @@
+import os
+import asyncio
+import argparse
+import importlib
+from dotenv import load_dotenv
+
+# Load environment variables from .env file; the modules below read their settings on import
+load_dotenv()
+
+from startupTimer import startup
+from alertPipeline import run_pipeline
+
+# Runs any mix of the alert detectors as one bot over a single shared pipeline:
+#
+#   python alertBot.py trade transfer token
+#   python alertBot.py                        # ALERT_DETECTORS from the .env file
+#
+# Each new transaction of a watched address is fetched and parsed once and then
+# handed to every detector that watches it. Detectors posting with the same
+# Telegram token share one bot and one outbound queue.
+
+# Detectors run when none are named on the command line, comma-separated
+ALERT_DETECTORS = os.getenv('ALERT_DETECTORS', 'trade')
+
+# Detector name -> module and class; a module is only imported when its detector runs
+DETECTORS = {
+    'trade': ('walletTradeAlert', 'TradeDetector'),
+    'transfer': ('walletTransferAlertTest', 'TransferDetector'),
+    'token': ('tokenTelegramActionBot', 'TokenActivityDetector'),
+}
+
+# Cursors of a combined run; a single detector keeps using its own script's cursors
+STATE_NAMESPACE = 'alertBot'
+
+
+def load_detector(name):
+    module, cls = DETECTORS[name]
+    return getattr(importlib.import_module(module), cls)()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Solana wallet and token alert bot")
+    parser.add_argument('detectors', nargs='*',
+                        help=f"any of {', '.join(DETECTORS)} (default: {ALERT_DETECTORS})")
+    args = parser.parse_args(argv)
+    names = args.detectors or [name.strip() for name in ALERT_DETECTORS.split(',') if name.strip()]
+    unknown = [name for name in names if name not in DETECTORS]
+    if unknown or not names:
+        parser.error(f"unknown detectors {unknown}; choose from {', '.join(DETECTORS)}")
+    # Naming a detector twice runs it once
+    return list(dict.fromkeys(names))
+
+
+async def main():
+    names = parse_args()
+    print(f"Starting alert bot with detectors: {', '.join(names)}...")
+    detectors = [load_detector(name) for name in names]
+    startup.mark('imports')
+    namespace = detectors[0].namespace if len(detectors) == 1 else STATE_NAMESPACE
+    await run_pipeline(detectors, namespace)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
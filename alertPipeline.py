@@ -0,0 +1,242 @@
+import os
+import signal
+import asyncio
+import contextlib
+from datetime import datetime
+from alertQueue import AlertQueue, LazyTelegramBot
+from blockScanner import run_block_scanner
+from httpPool import close_session
+from logSetup import get_logger
+from metrics import STAGE_SECONDS
+from pricing import price_book
+from rpcClient import SharedRpcClient
+from rpcPool import SOLANA_RPC_URL, TRANSIENT_ERRORS
+from rpcReplay import recording
+from startupTimer import startup
+from stateStore import StateStore
+from tokenMetadata import warm_token_index
+from txnParser import parse_transaction
+from walletWatcher import (
+    POLL_INTERVAL_SECONDS, run_wallet_watcher, fetch_new_signatures, drain_backlog, load_watched_wallets,
+)
+
+# How new transactions are found: 'signatures' polls every watched address,
+# 'blocks' walks every confirmed block once and matches it against the watch list
+INGEST_MODE = os.getenv('INGEST_MODE', 'signatures')
+
+logger = get_logger('alertPipeline')
+
+
+def _retry_scope(wallet, detector):
+    # Dedup scope of one detector's run on a wallet's transaction, kept only while the transaction is retried
+    return f"{wallet.address}/{detector.name}"
+
+
+def format_block_time(block_time):
+    if not block_time:
+        return 'Unknown time'
+    return datetime.utcfromtimestamp(block_time).strftime('%Y-%m-%d %H:%M:%S UTC')
+
+
+class Detector:
+    """One kind of alert, plugged into the shared fetch → decode → detect → deliver pipeline.
+
+    A detector names the addresses it needs (`watch`) and gets every new
+    transaction of those addresses already fetched and parsed (`detect`);
+    it never fetches on its own, so an address several detectors watch is
+    fetched and decoded once. Its alerts go to `chat_id` through the bot for
+    `telegram_token`, which detectors with the same token share.
+    """
+
+    name = None
+    # Cursors are kept under this StateStore namespace when the detector runs alone
+    namespace = None
+    telegram_token = None
+    chat_id = None
+    # Starting poll interval of the detector's addresses
+    poll_interval = POLL_INTERVAL_SECONDS
+    # Posted to `chat_id` on startup; None sends nothing
+    keep_alive_message = "🔥 Kaizen Crypto Wallet Tracker Bot is active! 🔥"
+
+    def watch(self):
+        """WatchedWallets this detector needs the transactions of; the Watch_Wallet_<n> list by default."""
+        return load_watched_wallets()
+
+    async def send_keep_alive_message(self, bot):
+        """Startup message; sent once per chat however many detectors post there."""
+        if self.keep_alive_message is None:
+            return
+        await bot.send_message(chat_id=self.chat_id, text=self.keep_alive_message)
+        logger.info("Queued keep-alive message", extra={'chat_id': self.chat_id})
+
+    async def detect(self, wallet, signature, txn, client, bot):
+        raise NotImplementedError
+
+
+class AlertPipeline:
+    """Fetches and parses each new transaction of a watched address once, then hands it to its detectors.
+
+    `monitor` has the signature run_wallet_watcher expects. Addresses are
+    routed to the detectors that asked for them in `watch`; any other
+    address (a shard's share, a replay) goes to every detector.
+    """
+
+    def __init__(self, detectors):
+        self.detectors = list(detectors)
+        # 32-byte address key -> detectors that watch it
+        self.subscribers = {}
+        # detector -> the outbound queue of its Telegram bot, when run_pipeline owns delivery
+        self.bots = {}
+
+    def watch(self):
+        """The addresses of every detector, each once and under the first detector's nickname."""
+        wallets = []
+        for detector in self.detectors:
+            for wallet in detector.watch():
+                subscribers = self.subscribers.get(wallet.key)
+                if subscribers is None:
+                    subscribers = self.subscribers[wallet.key] = []
+                    wallets.append(wallet)
+                if detector not in subscribers:
+                    subscribers.append(detector)
+        return wallets
+
+    async def process_transaction(self, wallets, signature, txn_dict, client, bot):
+        """Parse the transaction once and run the detectors of every watched wallet it concerns.
+
+        A detector failing on the RPC or the network makes this raise once
+        every detector has run, so the caller can retry the transaction
+        instead of moving past it.
+        """
+        if txn_dict is None:
+            logger.debug("Transaction details not found", extra={'signature': str(signature)})
+            return
+
+        with STAGE_SECONDS.time('decode'):
+            txn = parse_transaction(txn_dict)
+        if txn.meta is None:
+            logger.debug("Transaction metadata not found", extra={'signature': str(signature)})
+            return
+
+        # Swaps in this transaction price their tokens for every detector's alerts
+        price_book.observe_transaction(txn)
+
+        transient = None
+        # (wallet, scope) of every detector run that is not to be repeated when the transaction is retried
+        finished = []
+        for wallet in wallets:
+            for detector in self.subscribers.get(wallet.key, self.detectors):
+                scope = _retry_scope(wallet, detector)
+                if wallet.store is not None and wallet.store.is_seen(scope, signature):
+                    continue  # Already handled by an earlier attempt at this transaction
+                try:
+                    await detector.detect(wallet, signature, txn, client, self.bots.get(detector, bot))
+                except TRANSIENT_ERRORS as e:
+                    transient = e
+                    logger.warning("Detector failed; the transaction will be retried", extra={
+                        'detector': detector.name, 'wallet': wallet.address, 'signature': str(signature), 'error': e,
+                    })
+                    continue
+                except Exception:
+                    logger.exception("Error in detector", extra={
+                        'detector': detector.name, 'wallet': wallet.address, 'signature': str(signature),
+                    })
+                finished.append((wallet, scope))
+
+        if transient is not None:
+            # The caller leaves the cursor in place; on the retry only the failed detectors run again
+            for wallet, scope in finished:
+                if wallet.store is not None:
+                    wallet.store.mark_seen(scope, signature)
+            raise transient
+
+    async def monitor(self, wallet, client, bot):
+        try:
+            logger.debug("Fetching new transaction signatures", extra={'wallet': wallet.address})
+            # Page back to the cursor so every transaction since the last poll is processed
+            signatures = await fetch_new_signatures(client, wallet.pubkey, until=wallet.last_signature)
+            if not signatures or str(signatures[-1].signature) == wallet.last_signature:
+                logger.debug("No new transactions", extra={'wallet': wallet.address})
+                return
+
+            logger.info("Processing new transactions", extra={'wallet': wallet.address, 'count': len(signatures)})
+
+            async def process(signature, txn_dict):
+                await self.process_transaction([wallet], signature, txn_dict, client, bot)
+
+            # Transaction details are batched with the other wallets' pending signatures
+            await drain_backlog(wallet, signatures, client.get_transaction_json, process)
+            logger.debug("Updated cursor", extra={'wallet': wallet.address, 'cursor': wallet.last_signature})
+
+        except Exception:
+            logger.exception("Error in monitor", extra={'wallet': wallet.address})
+
+
+async def run_pipeline(detectors, namespace):
+    """Watch every address the detectors need over one RPC client, with one Telegram bot per token.
+
+    New transactions come from per-address signature polling, or from
+    scanning every block when INGEST_MODE is 'blocks'.
+    """
+    pipeline = AlertPipeline(detectors)
+    wallets = pipeline.watch()
+    if not wallets:
+        print("No wallet address provided in the .env file.")
+        exit(1)
+    for wallet in wallets:
+        print(f"Monitoring wallet: {wallet.address} ({wallet.nickname})")
+    startup.mark('wallets')
+    # Token names and the Telegram connections load in the background while the first poll runs
+    warm_token_index()
+    bots = {}
+    for detector in pipeline.detectors:
+        if detector.telegram_token not in bots:
+            bot = bots[detector.telegram_token] = LazyTelegramBot(detector.telegram_token)
+            bot.warm()
+    # Cursors and processed signatures survive restarts
+    store = StateStore(namespace)
+    startup.mark('state')
+    # `docker stop` sends SIGTERM; it unwinds like Ctrl+C, so the alert queues drain and the state is flushed
+    main_task = asyncio.current_task()
+    terminated = []
+
+    def terminate():
+        terminated.append(True)
+        main_task.cancel()
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, terminate)
+    try:
+        async with contextlib.AsyncExitStack() as stack:
+            client = await stack.enter_async_context(recording(SharedRpcClient(SOLANA_RPC_URL)))
+            # Alerts go through an outbound queue per bot so Telegram never blocks polling;
+            # the queues drain before their bots close
+            outbound = {}
+            for token, bot in bots.items():
+                await stack.enter_async_context(bot)
+                outbound[token] = await stack.enter_async_context(AlertQueue(bot))
+            pipeline.bots = {detector: outbound[detector.telegram_token] for detector in pipeline.detectors}
+
+            greeted = set()
+            for detector in pipeline.detectors:
+                chat = (detector.telegram_token, detector.chat_id)
+                if detector.keep_alive_message is not None and chat not in greeted:
+                    greeted.add(chat)
+                    await detector.send_keep_alive_message(pipeline.bots[detector])
+            startup.mark('setup')
+
+            if INGEST_MODE == 'blocks':
+                async def process(wallets, signature, txn_dict):
+                    await pipeline.process_transaction(wallets, signature, txn_dict, client, None)
+
+                await run_block_scanner(process, wallets, client, store=store)
+            else:
+                # Polling adapts per address from the most eager detector's interval
+                interval = min(detector.poll_interval for detector in pipeline.detectors)
+                await run_wallet_watcher(pipeline.monitor, wallets, client, None, interval=interval, store=store)
+    except asyncio.CancelledError:
+        if not terminated:
+            raise
+        logger.info("Stopped by SIGTERM")
+    finally:
+        store.close()
+        await close_session()
@@ -0,0 +1,214 @@
+import os
+import time
+import asyncio
+from collections import deque
+from logSetup import get_logger
+from metrics import STAGE_SECONDS, ALERTS
+
+# Telegram allows roughly 30 messages/s overall and 20 messages/minute into one group
+TELEGRAM_MESSAGES_PER_SECOND = float(os.getenv('TELEGRAM_MESSAGES_PER_SECOND', '25'))
+TELEGRAM_CHAT_MESSAGES_PER_MINUTE = float(os.getenv('TELEGRAM_CHAT_MESSAGES_PER_MINUTE', '20'))
+
+# Concurrent senders; one chat is only ever handled by one of them at a time
+ALERT_QUEUE_WORKERS = int(os.getenv('ALERT_QUEUE_WORKERS', '4'))
+
+# Retries for network errors before an alert is dropped
+ALERT_SEND_RETRIES = int(os.getenv('ALERT_SEND_RETRIES', '3'))
+
+# Telegram's message length limit, used when merging queued alerts
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+ALERT_SEPARATOR = '\n\n'
+
+logger = get_logger(__name__)
+
+
+def _seconds(retry_after):
+    # python-telegram-bot reports retry_after as seconds or as a timedelta depending on the version
+    return retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+
+
+class LazyTelegramBot:
+    """A Telegram Bot that is imported and initialized on first use instead of at startup.
+
+    python-telegram-bot is the slowest import of the bots, and initializing a
+    Bot is a network round trip. `warm()` starts both in the background so
+    the first alert does not wait for them, while polling starts right away.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.bot = None
+        self.init_task = None
+
+    async def _initialize(self):
+        start = time.perf_counter()
+        from telegram import Bot
+        bot = Bot(token=self.token)
+        await bot.initialize()
+        self.bot = bot
+        logger.info("Telegram bot ready", extra={'seconds': round(time.perf_counter() - start, 3)})
+        return bot
+
+    def _initialized(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Telegram bot initialization failed", extra={'error': task.exception()})
+
+    def warm(self):
+        task = self.init_task
+        # A failed initialization is retried by the next send
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            self.init_task = asyncio.ensure_future(self._initialize())
+            self.init_task.add_done_callback(self._initialized)
+        return self.init_task
+
+    async def send_message(self, **kwargs):
+        bot = self.bot or await asyncio.shield(self.warm())
+        return await bot.send_message(**kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.init_task is not None and not self.init_task.done():
+            self.init_task.cancel()
+        if self.bot is not None:
+            await self.bot.shutdown()
+            self.bot = None
+
+
+class AlertQueue:
+    """Outbound Telegram queue with worker tasks.
+
+    `send_message` only enqueues, so detection never waits on Telegram. The
+    workers respect the global and per-chat rate limits and honour
+    RetryAfter. Alerts that pile up for a chat while it is rate limited are
+    merged into a single message, which is resent as plain text if Telegram
+    rejects its Markdown.
+    """
+
+    def __init__(self, bot, workers=ALERT_QUEUE_WORKERS):
+        self.bot = bot
+        self.worker_count = workers
+        self.workers = []
+        # chat_id -> deque of (text, parse_mode, number of alerts merged into the text)
+        self.pending = {}
+        self.ready = asyncio.Queue()
+        self.scheduled = set()
+        self.chat_next_send = {}
+        self.global_next_send = 0.0
+        self.chat_interval = 60 / TELEGRAM_CHAT_MESSAGES_PER_MINUTE
+        self.global_interval = 1 / TELEGRAM_MESSAGES_PER_SECOND
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None, **kwargs):
+        self.pending.setdefault(chat_id, deque()).append((text, parse_mode, 1))
+        self._schedule(chat_id)
+
+    def _schedule(self, chat_id):
+        if chat_id not in self.scheduled:
+            self.scheduled.add(chat_id)
+            self.ready.put_nowait(chat_id)
+
+    def _take_batch(self, chat_id):
+        queue = self.pending[chat_id]
+        text, parse_mode, count = queue.popleft()
+        while queue:
+            next_text, next_mode, next_count = queue[0]
+            if next_mode != parse_mode or len(text) + len(ALERT_SEPARATOR) + len(next_text) > TELEGRAM_MAX_MESSAGE_LENGTH:
+                break
+            queue.popleft()
+            text = text + ALERT_SEPARATOR + next_text
+            count += next_count
+        return text, parse_mode, count
+
+    async def _wait_for_slot(self, chat_id):
+        now = time.monotonic()
+        delay = self.chat_next_send.get(chat_id, 0.0) - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+            now = time.monotonic()
+        # Reserve the next global slot before sleeping so workers space out
+        slot = max(self.global_next_send, now)
+        self.global_next_send = slot + self.global_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _send(self, chat_id):
+        # python-telegram-bot is only imported once there is something to send
+        from telegram.error import RetryAfter, BadRequest, NetworkError
+        await self._wait_for_slot(chat_id)
+        text, parse_mode, count = self._take_batch(chat_id)
+        for attempt in range(ALERT_SEND_RETRIES + 1):
+            try:
+                with STAGE_SECONDS.time('send'):
+                    await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                self.sent += 1
+                self.merged += count - 1
+                ALERTS.inc('sent')
+                if count > 1:
+                    ALERTS.inc('merged', amount=count - 1)
+                self.chat_next_send[chat_id] = time.monotonic() + self.chat_interval
+                return
+            except RetryAfter as e:
+                retry_after = _seconds(e.retry_after)
+                logger.warning("Telegram flood control", extra={'chat_id': chat_id, 'retry_in': round(retry_after)})
+                self.chat_next_send[chat_id] = time.monotonic() + retry_after
+                # Requeue at the front; alerts queued meanwhile are merged into the retry
+                self.pending[chat_id].appendleft((text, parse_mode, count))
+                return
+            except BadRequest as e:
+                # BadRequest is a NetworkError, but resending the same message cannot succeed.
+                # Usually it is Markdown that does not parse (a token name with '_' or '*'); as
+                # plain text the batch still goes out, with the alerts merged into it
+                if parse_mode is None:
+                    logger.warning("Telegram rejected alert", extra={'chat_id': chat_id, 'error': e})
+                    break
+                logger.warning("Telegram rejected alert formatting; sending as plain text",
+                               extra={'chat_id': chat_id, 'count': count, 'error': e})
+                parse_mode = None
+            except NetworkError as e:
+                logger.warning("Error sending Telegram alert", extra={'attempt': attempt + 1, 'error': e})
+                await asyncio.sleep(2 ** attempt)
+            except Exception:
+                logger.exception("Error sending Telegram alert", extra={'chat_id': chat_id})
+                break
+        self.dropped += count
+        ALERTS.inc('dropped', amount=count)
+        logger.error("Dropped alerts", extra={'chat_id': chat_id, 'count': count})
+
+    async def _worker(self):
+        while True:
+            chat_id = await self.ready.get()
+            try:
+                await self._send(chat_id)
+            finally:
+                self.scheduled.discard(chat_id)
+                if self.pending.get(chat_id):
+                    self._schedule(chat_id)
+                self.ready.task_done()
+
+    def start(self):
+        self.workers = [asyncio.ensure_future(self._worker()) for _ in range(self.worker_count)]
+
+    async def close(self, timeout=10):
+        # Give queued alerts a chance to go out before shutting down
+        try:
+            await asyncio.wait_for(self.ready.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Alert queue not drained before shutdown")
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
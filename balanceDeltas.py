@@ -0,0 +1,51 @@
+from collections import namedtuple
+from decimal import Decimal
+
+BalanceDelta = namedtuple('BalanceDelta', ['owner', 'mint', 'pre', 'post', 'delta', 'decimals'])
+
+
+def compute_balance_deltas(meta, account_keys):
+    """Token balance changes per (owner, mint), matching pre and post entries by accountIndex.
+
+    Amounts are the integer raw `amount`, so no float rounding creeps in and
+    identical pre/post entries can't be confused with each other. Accounts
+    created in the transaction simply have no pre entry and start from zero.
+    """
+    # accountIndex -> [owner, mint, pre, post, decimals]
+    accounts = {}
+    key_count = len(account_keys)
+    for side, entries in ((2, meta.get('preTokenBalances') or ()), (3, meta.get('postTokenBalances') or ())):
+        for balance in entries:
+            idx = balance.get('accountIndex')
+            if idx is None or idx >= key_count:
+                continue  # Skip if index is invalid
+            amount_info = balance.get('uiTokenAmount') or {}
+            entry = accounts.get(idx)
+            if entry is None:
+                entry = accounts[idx] = [balance.get('owner'), balance.get('mint'), 0, 0, amount_info.get('decimals', 0)]
+            elif entry[0] is None:
+                entry[0] = balance.get('owner')
+            entry[side] = int(amount_info.get('amount') or 0)
+
+    totals = {}
+    for idx, (owner, mint, pre, post, decimals) in accounts.items():
+        key = (owner or account_keys[idx], mint)
+        total = totals.get(key)
+        if total is None:
+            totals[key] = [pre, post, decimals]
+        else:
+            total[0] += pre
+            total[1] += post
+
+    return [
+        BalanceDelta(owner, mint, pre, post, post - pre, decimals)
+        for (owner, mint), (pre, post, decimals) in totals.items()
+    ]
+
+
+def format_token_amount(raw_amount, decimals):
+    """Raw integer amount as a plain decimal string, like the RPC's uiAmountString."""
+    text = format(Decimal(raw_amount).scaleb(-decimals), 'f')
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text
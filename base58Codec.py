@@ -0,0 +1,21 @@
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+
+
+def b58decode(text):
+    """Decode base58 text, such as the RPC's encoding of unparsed instruction data."""
+    number = 0
+    for char in text:
+        number = number * 58 + BASE58_INDEX[char]
+    data = number.to_bytes((number.bit_length() + 7) // 8, 'big')
+    return b'\0' * (len(text) - len(text.lstrip('1'))) + data
+
+
+def b58encode(data):
+    """Encode bytes as base58 text, the way signatures and block hashes are written."""
+    number = int.from_bytes(data, 'big')
+    encoded = ''
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+    return '1' * (len(data) - len(data.lstrip(b'\0'))) + encoded
@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import time
+from balanceDeltas import compute_balance_deltas
+
+# Compares the old pre/post balance loop from walletTradeAlert.monitor_wallet with
+# compute_balance_deltas on the recorded multi-hop swap, scaled up to larger
+# routes by repeating its token balance entries under fresh accounts and owners.
+#
+#   python benchmarkBalanceDeltas.py [iterations]
+
+FIXTURE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'transactions', 'jupiterMultiHopSell.json'
+)
+
+
+def legacy_balances(meta, account_keys):
+    # The original loop, minus its per-entry prints
+    pre_balances = meta.get('preTokenBalances', [])
+    post_balances = meta.get('postTokenBalances', [])
+    balances = {}
+    for balance in pre_balances + post_balances:
+        idx = balance.get('accountIndex')
+        if idx is None or idx >= len(account_keys):
+            continue
+        owner = balance.get('owner')
+        if owner is None:
+            owner = account_keys[idx]
+        owner = str(owner).strip().lower()
+        mint = balance.get('mint')
+        amount_info = balance.get('uiTokenAmount')
+        amount_str = amount_info.get('uiAmountString') if amount_info else None
+        amount = float(amount_str) if amount_str is not None else 0
+        key = (owner, mint)
+        if balance in pre_balances:
+            balances.setdefault(key, {})['pre'] = amount
+        else:
+            balances.setdefault(key, {})['post'] = amount
+    return balances
+
+
+def scaled_swap(txn, hops):
+    meta = txn['meta']
+    account_keys = [key['pubkey'] for key in txn['transaction']['message']['accountKeys']]
+    pre, post = [], []
+    for hop in range(hops):
+        offset = hop * len(account_keys)
+        for source, target in ((meta['preTokenBalances'], pre), (meta['postTokenBalances'], post)):
+            for balance in source:
+                entry = dict(balance)
+                entry['accountIndex'] = balance['accountIndex'] + offset
+                entry['owner'] = f"{balance['owner']}-{hop}"
+                target.append(entry)
+    keys = [f"{key}-{hop}" for hop in range(hops) for key in account_keys]
+    return {'preTokenBalances': pre, 'postTokenBalances': post}, keys
+
+
+def bench(label, fn, meta, keys, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(meta, keys)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {elapsed / iterations * 1e6:10.1f} us/tx")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with open(FIXTURE_PATH) as f:
+        txn = json.load(f)
+    for hops in (1, 4, 16, 64):
+        meta, keys = scaled_swap(txn, hops)
+        entries = len(meta['preTokenBalances']) + len(meta['postTokenBalances'])
+        print(f"{hops} hop(s), {entries} balance entries:")
+        bench('legacy pre/post scan', legacy_balances, meta, keys, iterations)
+        bench('compute_balance_deltas', compute_balance_deltas, meta, keys, iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import gc
+import sys
+import glob
+import tracemalloc
+from solders.pubkey import Pubkey
+from balanceDeltas import compute_balance_deltas
+from dexDecoders import decode_swaps
+from pollScheduler import PollScheduler
+from tokenTransfers import decode_token_transfers
+from txnParser import loads, parse_transaction
+from walletWatcher import WatchedWallet, WatchIndex
+
+# Reports the memory cost of the watch list and of decoding transactions:
+#
+#   - bytes per watched address, for the wallet records and their index alone
+#     and with the poll scheduler's per-wallet state, next to the previous
+#     layout (a __dict__ per wallet with a lowercased copy of the address,
+#     indexed by address text);
+#   - per decoding stage of the recorded fixtures, the blocks and bytes each
+#     transaction leaves allocated in its results, and the transient peak.
+#
+#   python benchmarkMemory.py [addresses] [transactions]
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'transactions')
+
+
+class LegacyWatchedWallet:
+    # The wallet record before it had __slots__ and a 32-byte key
+    def __init__(self, address, nickname='Wallet'):
+        self.address = address
+        self.address_lower = address.lower()
+        self.nickname = nickname
+        self.pubkey = Pubkey.from_string(address)
+        self.last_signature = None
+        self.store = None
+        self.lock = None
+        self.poll_requested = False
+
+
+def legacy_watch_list(keys):
+    wallets = [LegacyWatchedWallet(str(Pubkey(key))) for key in keys]
+    return wallets, {wallet.address: wallet for wallet in wallets}
+
+
+def watch_list(keys):
+    wallets = [WatchedWallet(str(Pubkey(key))) for key in keys]
+    return wallets, WatchIndex(wallets)
+
+
+def scheduled(build):
+    def run(keys):
+        wallets, index = build(keys)
+        return wallets, index, PollScheduler(None, wallets, 60)
+    return run
+
+
+def traced(fn, inputs):
+    """(results, live bytes, live blocks, transient peak bytes) of calling fn on every input."""
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    results = [fn(item) for item in inputs]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, current, sys.getallocatedblocks() - blocks, peak - current
+
+
+def bench_addresses(count):
+    keys = [os.urandom(32) for _ in range(count)]
+    print(f"{count} watched addresses:")
+    for label, build in (
+        ('legacy wallets + dict', legacy_watch_list),
+        ('wallets + WatchIndex', watch_list),
+        ('legacy + poll scheduler', scheduled(legacy_watch_list)),
+        ('current + poll scheduler', scheduled(watch_list)),
+    ):
+        _, live, blocks, _ = traced(lambda _: build(keys), [None])
+        print(f"  {label:<26} {live / count:8.1f} bytes/address {blocks / count:6.1f} blocks/address")
+
+
+def bench_transactions(count):
+    raw = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.json'))):
+        with open(path, 'rb') as f:
+            raw.append(f.read())
+    raw = [raw[i % len(raw)] for i in range(count)]
+    dicts = [loads(data) for data in raw]
+    txns = [parse_transaction(txn_dict) for txn_dict in dicts]
+
+    print(f"{count} transactions, per transaction:")
+    for label, fn, inputs in (
+        ('json decode', loads, raw),
+        ('parse_transaction', parse_transaction, dicts),
+        ('decode_swaps', decode_swaps, txns),
+        ('compute_balance_deltas', lambda txn: compute_balance_deltas(txn.meta, txn.account_keys), txns),
+        ('decode_token_transfers', decode_token_transfers, txns),
+    ):
+        _, live, blocks, peak = traced(fn, inputs)
+        print(f"  {label:<24} {blocks / count:7.1f} blocks {live / count:9.1f} bytes live  "
+              f"{peak:9,d} bytes transient peak")
+
+
+def main():
+    addresses = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    transactions = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    bench_addresses(addresses)
+    bench_transactions(transactions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import glob
+import base64
+import time
+import asyncio
+import tracemalloc
+import contextlib
+from statistics import median
+
+# Replays recorded RPC responses through walletTradeAlert.monitor_wallet, the
+# trade and transfer detectors sharing one AlertPipeline, and
+# tokenTelegramActionBot.check_transaction with a fake Telegram bot, and reports
+# throughput, per-stage latency and memory. Without a recording, the fixtures
+# in fixtures/transactions are repeated under fresh signatures, and the wallet
+# runs exit non-zero unless they raise EXPECTED_ALERTS.
+#
+#   python benchmarkReplay.py [transactions] [recording.json] [rpc latency ms]
+#
+# A recording is captured from a live bot by setting RPC_RECORD_PATH.
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'transactions')
+WSOL_MINT = 'So11111111111111111111111111111111111111112'
+TOKEN_PROGRAM_ID = 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA'
+CURSOR_SIGNATURE = 'replay-cursor'
+
+# Alerts each fixture must raise per detector; a synthetic replay that raises
+# any other number fails, so a detector that stops alerting is caught offline
+EXPECTED_ALERTS = {
+    'jupiterMultiHopSell.json': {'trade': 1, 'transfer': 2},
+    'jupiterRaydiumBuy.json': {'trade': 1, 'transfer': 2},
+    'pumpFunBuy.json': {'trade': 1, 'transfer': 1},
+    'pumpFunSell.json': {'trade': 1, 'transfer': 1},
+    'walletSendsMeme.json': {'trade': 1, 'transfer': 2},
+}
+
+
+def fixture_paths():
+    return sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.json')))
+
+
+def expected_alerts(count, detectors):
+    names = [os.path.basename(path) for path in fixture_paths()]
+    return sum(EXPECTED_ALERTS[names[i % len(names)]][detector] for i in range(count) for detector in detectors)
+
+
+def token_account_data(mint, owner):
+    # The 165-byte token account layout: mint, owner, amount, then fields the cache never reads
+    from solders.pubkey import Pubkey
+    return base64.b64encode(bytes(Pubkey.from_string(mint)) + bytes(Pubkey.from_string(owner)) + bytes(101)).decode()
+
+
+def wallet_token_accounts(fixtures, wallet):
+    # What getTokenAccountsByOwner answers for the wallet: every token account it owns in the fixtures
+    accounts = {}
+    for fixture in fixtures:
+        account_keys = fixture['transaction']['message']['accountKeys']
+        for balance in fixture['meta']['postTokenBalances']:
+            if balance.get('owner') == wallet:
+                account = account_keys[balance['accountIndex']]['pubkey']
+                program_id = balance.get('programId', TOKEN_PROGRAM_ID)
+                accounts[account] = [account, token_account_data(balance['mint'], wallet), program_id]
+    return list(accounts.values())
+
+
+def synthetic_recording(count):
+    fixtures = []
+    for path in fixture_paths():
+        with open(path) as f:
+            fixtures.append(json.load(f))
+    wallet = fixtures[0]['transaction']['message']['accountKeys'][0]['pubkey']
+    base_time = min(fixture['blockTime'] for fixture in fixtures)
+
+    transactions = {}
+    for i in range(count):
+        # Ten transactions per second of chain time, so the activity windows roll over
+        transactions[f'replay{i:08d}'] = dict(fixtures[i % len(fixtures)], blockTime=base_time + i // 10)
+    # Newest first, with the cursor as the oldest entry
+    signatures = list(reversed(list(transactions))) + [CURSOR_SIGNATURE]
+
+    # The token bot watches the most traded non-SOL mint
+    counts = {}
+    for fixture in fixtures:
+        for balance in fixture['meta']['postTokenBalances']:
+            if balance['mint'] != WSOL_MINT:
+                counts[balance['mint']] = counts.get(balance['mint'], 0) + 1
+    mint = max(counts, key=counts.get)
+
+    recording = {
+        'signatures': {wallet: signatures, mint: signatures},
+        'transactions': transactions,
+        'token_accounts': {wallet: wallet_token_accounts(fixtures, wallet)},
+        'accounts': {},
+    }
+    return recording, wallet, mint
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}
+
+    def wrap(self, stage, fn):
+        samples = self.samples.setdefault(stage, [])
+        if asyncio.iscoroutinefunction(fn):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    samples.append(time.perf_counter() - start)
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    samples.append(time.perf_counter() - start)
+        return timed
+
+    def report(self):
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            print(f"  {stage:<22} {len(samples):>7} calls  p50 {median(ordered) * 1e6:9.1f} us  "
+                  f"p99 {p99 * 1e6:9.1f} us  total {sum(samples):7.3f} s")
+
+
+async def replay(label, run, count, timer, bot, expected=None):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        await run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{label}: {count} transactions in {elapsed:.3f} s ({count / elapsed:,.0f} tx/s), "
+          f"{len(bot.messages)} alerts, peak traced memory {peak / 1024 / 1024:.1f} MiB")
+    timer.report()
+    if expected is not None and len(bot.messages) != expected:
+        raise SystemExit(f"{label}: expected {expected} alerts, got {len(bot.messages)}")
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    recording_path = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] != '-' else None
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    if recording_path:
+        from rpcReplay import load_recording
+        recording = load_recording(recording_path)
+        wallet_address = os.getenv('REPLAY_WALLET') or next(iter(recording['signatures']))
+        mint = os.getenv('REPLAY_MINT') or wallet_address
+        cursor = recording['signatures'][wallet_address][-1]
+        count = len(recording['signatures'][wallet_address]) - 1
+    else:
+        recording, wallet_address, mint = synthetic_recording(count)
+        cursor = CURSOR_SIGNATURE
+
+    def expect(*detectors):
+        # Live recordings have no known alert counts
+        return None if recording_path else expected_alerts(count, detectors)
+
+    # The scripts read their configuration at import time
+    os.environ['MAX_CATCHUP_SIGNATURES'] = str(count + 1)
+    os.environ.setdefault('TARGET_ADDRESS', mint)
+    os.environ.setdefault('TELEGRAM_TOKEN', '0:replay')
+    # Per-transaction logging would dominate the measurement
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import alertPipeline
+    import tokenMetadata
+    import walletTradeAlert
+    import walletTransferAlertTest
+    import tokenTelegramActionBot
+    from pricing import price_book
+    from rpcReplay import ReplayRpcClient, FakeBot
+    from walletWatcher import WatchedWallet
+
+    # Everything is served from the recording: no token list download, no price API
+    tokenMetadata.token_index = {}
+    price_book.external_source = None
+
+    client = ReplayRpcClient(recording, latency_ms)
+    # The unwrapped stages; every run below wraps them with a fresh timer
+    parse_transaction = alertPipeline.parse_transaction
+    decode_swaps = walletTradeAlert.decode_swaps
+    compute_balance_deltas = walletTradeAlert.compute_balance_deltas
+    decode_token_transfers = walletTransferAlertTest.decode_token_transfers
+
+    def instrument(timer):
+        client.get_signatures_for_address = timer.wrap(
+            'getSignatures', ReplayRpcClient.get_signatures_for_address.__get__(client))
+        client.get_transaction_json = timer.wrap('getTransaction', ReplayRpcClient.get_transaction_json.__get__(client))
+        # The transfer detector loads the wallet's token accounts through the replayed getTokenAccountsByOwner
+        client.get_token_accounts_by_owner = timer.wrap(
+            'getTokenAccounts', ReplayRpcClient.get_token_accounts_by_owner.__get__(client))
+        alertPipeline.parse_transaction = timer.wrap('parse', parse_transaction)
+        walletTradeAlert.decode_swaps = timer.wrap('decode swaps', decode_swaps)
+        walletTradeAlert.compute_balance_deltas = timer.wrap('balance deltas', compute_balance_deltas)
+        walletTransferAlertTest.decode_token_transfers = timer.wrap('decode transfers', decode_token_transfers)
+        tokenTelegramActionBot.decode_swaps = timer.wrap('decode swaps', decode_swaps)
+        bot = FakeBot()
+        bot.send_message = timer.wrap('alert', bot.send_message)
+        return bot
+
+    def replay_wallet():
+        wallet = WatchedWallet(wallet_address, 'Replay')
+        wallet.last_signature = cursor
+        return wallet
+
+    timer = StageTimer()
+    bot = instrument(timer)
+    wallet = replay_wallet()
+    await replay('walletTradeAlert.monitor_wallet',
+                 lambda: walletTradeAlert.monitor_wallet(wallet, client, bot), count, timer, bot, expect('trade'))
+
+    # Both wallet detectors over one pipeline: each transaction is still fetched and parsed once
+    timer = StageTimer()
+    bot = instrument(timer)
+    wallet = replay_wallet()
+    pipeline = alertPipeline.AlertPipeline([walletTradeAlert.TradeDetector(), walletTransferAlertTest.TransferDetector()])
+    await replay('AlertPipeline(trade, transfer).monitor',
+                 lambda: pipeline.monitor(wallet, client, bot), count, timer, bot, expect('trade', 'transfer'))
+
+    timer = StageTimer()
+    bot = instrument(timer)
+    target = tokenTelegramActionBot.TARGET
+    target.last_signature = cursor
+    await replay('tokenTelegramActionBot.check_transaction',
+                 lambda: tokenTelegramActionBot.check_transaction(target, client, bot), count, timer, bot)
+
+if __name__ == "__main__":
+    asyncio.run(main())
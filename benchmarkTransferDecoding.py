@@ -0,0 +1,51 @@
+import os
+import sys
+import copy
+import json
+import time
+from tokenTransfers import decode_token_transfers
+from txnParser import parse_transaction
+
+# Times decode_token_transfers on the recorded Jupiter multi-hop sell, whose
+# transfers all happen by CPI, in both the jsonParsed encoding the bots fetch
+# and the raw 'json' encoding (base58 data, accounts as indices). The route is
+# scaled up by repeating the swap's inner instructions.
+#
+#   python benchmarkTransferDecoding.py [iterations]
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'transactions')
+FIXTURE_NAME = 'jupiterMultiHopSell.json'
+ENCODINGS = (('jsonParsed', FIXTURE_DIR), ('json', os.path.join(FIXTURE_DIR, 'json')))
+
+
+def scaled_route(txn_dict, hops):
+    txn = copy.deepcopy(txn_dict)
+    for group in txn['meta']['innerInstructions']:
+        group['instructions'] = group['instructions'] * hops
+    return parse_transaction(txn)
+
+
+def bench(label, txn, iterations):
+    transfers = len(decode_token_transfers(txn))
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decode_token_transfers(txn)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<12} {transfers:>5} transfers {elapsed / iterations * 1e6:10.1f} us/tx "
+          f"{transfers * iterations / elapsed:12,.0f} transfers/s")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    fixtures = {}
+    for encoding, directory in ENCODINGS:
+        with open(os.path.join(directory, FIXTURE_NAME)) as f:
+            fixtures[encoding] = json.load(f)
+    for hops in (1, 4, 16, 64):
+        print(f"{hops}x route:")
+        for encoding, txn_dict in fixtures.items():
+            bench(encoding, scaled_route(txn_dict, hops), iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import glob
+import json
+import time
+import txnParser
+from txnParser import parse_transaction
+
+# Compares the old to_json()/json.loads round trip with raw-bytes decoding,
+# on the recorded getTransaction fixtures.
+#
+#   python benchmarkTxnParsing.py [iterations]
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'transactions')
+
+
+def load_fixtures():
+    responses = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.json'))):
+        with open(path) as f:
+            result = json.load(f)
+        # Wrap each recorded result the way it comes off the wire
+        responses.append(json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': result}).encode())
+    return responses
+
+
+def bench(label, fn, items, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for item in items:
+            fn(item)
+    elapsed = time.perf_counter() - start
+    count = iterations * len(items)
+    print(f"{label:<40} {elapsed / count * 1e6:9.1f} us/tx {count / elapsed:10.0f} tx/s")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    responses = load_fixtures()
+    print(f"{len(responses)} fixture transactions, {iterations} iterations")
+
+    bench('raw bytes -> json.loads', lambda raw: parse_transaction(json.loads(raw)['result']), responses, iterations)
+    if txnParser.orjson is not None:
+        bench('raw bytes -> orjson.loads', lambda raw: parse_transaction(txnParser.orjson.loads(raw)['result']), responses, iterations)
+    else:
+        print("orjson not installed; skipping the orjson path")
+
+    try:
+        from solders.rpc.responses import GetTransactionResp
+    except ImportError:
+        print("solders not installed; skipping the typed path")
+        return
+
+    typed = [GetTransactionResp.from_json(raw.decode()).value for raw in responses]
+    bench('typed -> to_json() -> json.loads', lambda txn: parse_transaction(json.loads(txn.to_json())), typed, iterations)
+
+
+if __name__ == "__main__":
+    main()
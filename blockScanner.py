@@ -0,0 +1,215 @@
+import os
+import time
+import asyncio
+from collections import deque
+from logSetup import get_logger
+from rpcPool import RpcError, TRANSIENT_ERRORS, SLOT_SECONDS, RPC_BACKOFF_MAX_SECONDS
+from startupTimer import startup
+from walletWatcher import WatchIndex
+from metrics import (
+    STAGE_SECONDS, SIGNATURES_DEDUPED, SIGNATURES_DROPPED, SIGNATURES_RETRIED, BLOCKS_SCANNED, BLOCK_SCAN_LAG,
+    WALLET_LAG, start_metrics_server,
+)
+
+# getBlock requests in flight ahead of the block being matched
+BLOCK_SCAN_PREFETCH = int(os.getenv('BLOCK_SCAN_PREFETCH', '8'))
+
+# Attempts per slot before a block the RPC answers with an error is skipped; an RPC outage is waited out instead
+BLOCK_SCAN_MAX_ATTEMPTS = int(os.getenv('BLOCK_SCAN_MAX_ATTEMPTS', '5'))
+
+# On restart, slots further behind the tip than this are not caught up (9000 slots is about an hour)
+BLOCK_SCAN_MAX_CATCHUP_SLOTS = int(os.getenv('BLOCK_SCAN_MAX_CATCHUP_SLOTS', '9000'))
+
+# StateStore key of the last slot whose block was fully processed
+SLOT_CURSOR = 'blockScan'
+
+logger = get_logger(__name__)
+
+
+def _retry_delay(attempt):
+    return min(SLOT_SECONDS * 2 ** attempt, RPC_BACKOFF_MAX_SECONDS)
+
+
+def _candidates(entry):
+    # Every address a transaction touches: its account keys (lookup-table ones included)
+    # and the owners and mints of its token balances
+    message = entry.get('transaction', {}).get('message', {})
+    for key in message.get('accountKeys', ()):
+        yield key.get('pubkey') if isinstance(key, dict) else key
+    meta = entry.get('meta') or {}
+    loaded = meta.get('loadedAddresses') or {}
+    yield from loaded.get('writable', ())
+    yield from loaded.get('readonly', ())
+    for balances in (meta.get('preTokenBalances') or (), meta.get('postTokenBalances') or ()):
+        for balance in balances:
+            yield balance.get('owner')
+            yield balance.get('mint')
+
+
+class BlockScanner:
+    """Walks confirmed blocks in slot order and hands each transaction to the watched wallets it touches.
+
+    Instead of one getSignaturesForAddress per wallet per cycle, every block
+    is fetched once with getBlock, so the RPC cost follows chain throughput
+    and not the size of the watch list. Up to `prefetch` blocks are fetched
+    ahead while the oldest one is matched against the WatchIndex by account
+    keys, token balance owners and mints. That also catches transfers into a
+    wallet's existing token accounts, which never name the wallet itself.
+
+    `process(wallets, signature, txn_dict)` gets each matching transaction
+    once, with every wallet it concerns, as the same getTransaction-shaped
+    dict the signature poller fetches. Matches are deduped per wallet in the
+    store, and the last fully processed slot is kept there too.
+    """
+
+    def __init__(self, client, wallets, process, store=None, prefetch=BLOCK_SCAN_PREFETCH):
+        self.client = client
+        self.index = WatchIndex(wallets)
+        self.process = process
+        self.store = store
+        self.prefetch = max(prefetch, 1)
+
+    def match(self, entry):
+        return self.index.match(address for address in _candidates(entry) if address)
+
+    def _start_slot(self, tip):
+        cursor = self.store.get_cursor(SLOT_CURSOR) if self.store is not None else None
+        if cursor is None:
+            return tip
+        start = int(cursor) + 1
+        if tip - start > BLOCK_SCAN_MAX_CATCHUP_SLOTS:
+            logger.warning("Block scan cursor too far behind; skipping ahead", extra={
+                'cursor': cursor, 'tip': tip, 'skipped': tip - start - BLOCK_SCAN_MAX_CATCHUP_SLOTS,
+            })
+            return tip - BLOCK_SCAN_MAX_CATCHUP_SLOTS
+        return start
+
+    async def _get_tip(self):
+        attempt = 0
+        while True:
+            try:
+                return await self.client.get_slot()
+            except RpcError as e:
+                delay = _retry_delay(attempt)
+                logger.warning("Could not get the tip slot; retrying", extra={'retry_in': delay, 'error': e})
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _fetch(self, slot):
+        error = None
+        attempt = outage = 0
+        while attempt < BLOCK_SCAN_MAX_ATTEMPTS:
+            try:
+                with STAGE_SECONDS.time('block'):
+                    block = await self.client.get_block_json(slot)
+            except TRANSIENT_ERRORS as e:
+                # No endpoint answered; the slot is not given up on, or its transactions would be lost
+                delay = _retry_delay(outage)
+                logger.warning("Block fetch failed; retrying", extra={'slot': slot, 'retry_in': delay, 'error': e})
+                await asyncio.sleep(delay)
+                outage += 1
+                continue
+            except RpcError as e:
+                # Usually a block just past the tip that the node has not finished replaying
+                error = e
+                await asyncio.sleep(SLOT_SECONDS * 2 ** attempt)
+                attempt += 1
+                continue
+            if block is None:
+                BLOCKS_SCANNED.inc('skipped')
+            return block
+        BLOCKS_SCANNED.inc('failed')
+        logger.warning("Block unavailable, skipping slot", extra={'slot': slot, 'error': error})
+        return None
+
+    async def _scan(self, slot, block):
+        block_time = block.get('blockTime')
+        with STAGE_SECONDS.time('match'):
+            matches = []
+            for entry in block.get('transactions') or ():
+                wallets = self.match(entry)
+                if wallets:
+                    matches.append((entry, wallets))
+
+        for entry, wallets in matches:
+            signature = entry['transaction']['signatures'][0]
+            # getTransaction carries the slot and block time on every transaction; a block only once
+            txn_dict = dict(entry, slot=slot, blockTime=block_time)
+            todo = [wallet for wallet in wallets if not wallet.is_processed(signature)]
+            if len(todo) < len(wallets):
+                SIGNATURES_DEDUPED.inc(amount=len(wallets) - len(todo))
+            if not todo:
+                continue
+            try:
+                await self.process(todo, signature, txn_dict)
+            except TRANSIENT_ERRORS:
+                # The transactions processed so far are marked, so retrying the block resumes here
+                SIGNATURES_RETRIED.inc()
+                raise
+            except Exception:
+                SIGNATURES_DROPPED.inc('error')
+                logger.exception("Error processing transaction", extra={'signature': signature})
+            for wallet in todo:
+                wallet.mark_processed(signature)
+                if block_time:
+                    WALLET_LAG.set(round(time.time() - block_time, 3), wallet.address)
+        BLOCKS_SCANNED.inc('scanned')
+
+    async def _scan_until_done(self, slot, block):
+        # The slot cursor only moves past a block once an RPC or network failure no longer interrupts it
+        attempt = 0
+        while True:
+            try:
+                await self._scan(slot, block)
+                return
+            except TRANSIENT_ERRORS as e:
+                delay = _retry_delay(attempt)
+                logger.warning("Block processing failed; retrying", extra={'slot': slot, 'retry_in': delay, 'error': e})
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def run(self):
+        tip = await self._get_tip()
+        next_slot = self._start_slot(tip)
+        logger.info("Scanning blocks", extra={'from_slot': next_slot, 'tip': tip, 'wallets': len(self.index)})
+        # (slot, getBlock task) in slot order
+        pending = deque()
+        try:
+            while True:
+                if next_slot > tip and not pending:
+                    # The tip is only asked for again once every block up to the cached one is processed
+                    tip = await self._get_tip()
+                    if next_slot > tip:
+                        # Caught up with the tip; a new slot is due about every SLOT_SECONDS
+                        await asyncio.sleep(SLOT_SECONDS)
+                        continue
+                while len(pending) < self.prefetch and next_slot <= tip:
+                    pending.append((next_slot, asyncio.ensure_future(self._fetch(next_slot))))
+                    next_slot += 1
+
+                slot, task = pending.popleft()
+                block = await task
+                if block is not None:
+                    await self._scan_until_done(slot, block)
+                if self.store is not None:
+                    self.store.set_cursor(SLOT_CURSOR, slot)
+                BLOCK_SCAN_LAG.set(max(tip - slot, 0))
+                startup.done('first_block')
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+
+async def run_block_scanner(process, wallets, client, store=None):
+    """Scan blocks for every wallet until cancelled; the block-scanning counterpart of run_wallet_watcher."""
+    if store is not None:
+        for wallet in wallets:
+            wallet.attach_store(store)
+        store.start()
+
+    metrics_server = await start_metrics_server()
+    try:
+        await BlockScanner(client, wallets, process, store).run()
+    finally:
+        if metrics_server is not None:
+            await metrics_server.cleanup()
@@ -0,0 +1,190 @@
+from collections import namedtuple
+from tokenTransfers import TOKEN_PROGRAM_IDS
+from base58Codec import b58decode
+
+WSOL_MINT = 'So11111111111111111111111111111111111111112'
+SOL_DECIMALS = 9
+
+SYSTEM_PROGRAM_ID = '11111111111111111111111111111111'
+
+# One swap by one trader: `in` is what the trader gave up, `out` what they received.
+# Amounts are raw integer units; native SOL is reported as wrapped SOL.
+SwapTrade = namedtuple('SwapTrade', [
+    'trader', 'venue', 'route',
+    'in_mint', 'in_amount', 'in_decimals',
+    'out_mint', 'out_amount', 'out_decimals',
+])
+
+
+class SwapContext:
+    """What every decoder can look up about the transaction, built once per transaction."""
+
+    __slots__ = ('txn', 'token_accounts')
+
+    def __init__(self, txn):
+        self.txn = txn
+        meta = txn.meta or {}
+        # token account -> (mint, owner, decimals), from the balance entries
+        self.token_accounts = {}
+        key_count = len(txn.account_keys)
+        for entries in (meta.get('preTokenBalances') or (), meta.get('postTokenBalances') or ()):
+            for balance in entries:
+                idx = balance.get('accountIndex')
+                if idx is None or idx >= key_count:
+                    continue
+                decimals = (balance.get('uiTokenAmount') or {}).get('decimals', 0)
+                self.token_accounts[txn.account_keys[idx]] = (balance.get('mint'), balance.get('owner'), decimals)
+
+    def lamport_change(self, owner):
+        """Native SOL change of `owner` over the transaction, not counting the fee it paid."""
+        meta = self.txn.meta or {}
+        pre, post = meta.get('preBalances') or (), meta.get('postBalances') or ()
+        try:
+            idx = self.txn.account_keys.index(owner)
+        except ValueError:
+            return 0
+        if idx >= len(pre) or idx >= len(post):
+            return 0
+        change = post[idx] - pre[idx]
+        return change + meta.get('fee', 0) if idx == 0 else change
+
+
+def _parsed_legs(ctx, instruction):
+    """(owner, mint, raw change, decimals) for the token or SOL movement of one parsed instruction."""
+    parsed = instruction.get('parsed')
+    if not isinstance(parsed, dict):
+        return ()
+    kind = parsed.get('type')
+    info = parsed.get('info') or {}
+    program_id = instruction.get('programId')
+
+    if program_id in TOKEN_PROGRAM_IDS and kind in ('transfer', 'transferChecked'):
+        source = ctx.token_accounts.get(info.get('source'))
+        destination = ctx.token_accounts.get(info.get('destination'))
+        account = source or destination
+        if account is None:
+            return ()
+        mint, _, decimals = account
+        amount = info.get('amount')
+        if amount is None:
+            amount = (info.get('tokenAmount') or {}).get('amount', 0)
+        amount = int(amount)
+        source_owner = source[1] if source else info.get('authority')
+        destination_owner = destination[1] if destination else None
+        return ((source_owner, mint, -amount, decimals), (destination_owner, mint, amount, decimals))
+
+    if program_id == SYSTEM_PROGRAM_ID and kind == 'transfer':
+        lamports = int(info.get('lamports', 0))
+        return ((info.get('source'), WSOL_MINT, -lamports, SOL_DECIMALS),
+                (info.get('destination'), WSOL_MINT, lamports, SOL_DECIMALS))
+
+    return ()
+
+
+def transfer_legs(ctx, instruction, inner):
+    """Default decoder: the token and SOL transfers the swap made through CPI."""
+    legs = []
+    for child in inner:
+        legs.extend(_parsed_legs(ctx, child))
+    return legs
+
+
+# Anchor discriminators of the Pump.fun bonding curve instructions
+PUMP_FUN_BUY = bytes([102, 6, 61, 18, 1, 218, 235, 234])
+PUMP_FUN_SELL = bytes([51, 230, 133, 164, 1, 127, 131, 173])
+
+
+def pump_fun_legs(ctx, instruction, inner):
+    """Pump.fun buys pay SOL by system transfer, but sells credit lamports directly
+    from the curve account, so the SOL leg of a sell comes from the balance change."""
+    legs = transfer_legs(ctx, instruction, inner)
+    data = instruction.get('data')
+    if not data or b58decode(data)[:8] != PUMP_FUN_SELL:
+        return legs
+    for owner, mint, amount, _ in list(legs):
+        if amount < 0 and mint != WSOL_MINT and not any(o == owner and m == WSOL_MINT for o, m, _, _ in legs):
+            legs.append((owner, WSOL_MINT, ctx.lamport_change(owner), SOL_DECIMALS))
+            break
+    return legs
+
+
+# Program ID -> (venue, decoder(ctx, instruction, inner instructions) -> legs)
+DEX_DECODERS = {}
+
+
+def register_decoder(program_id, venue, decoder=transfer_legs):
+    DEX_DECODERS[program_id] = (venue, decoder)
+
+
+register_decoder('JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QNyVTaV4', 'Jupiter')
+register_decoder('JUP4Fb2cqiRUcaTHdrPC8h2gNsA2ETXiPDD33WcGuJB', 'Jupiter')
+register_decoder('675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8', 'Raydium')        # AMM v4
+register_decoder('CPMMoo8L3F4NbTegBCKVNunggL7H1ZpdTHKxQB5qKP1C', 'Raydium')        # CPMM
+register_decoder('CAMMCzo5YL8w4VFF8KVHrK22GGUsp5VTaW7grrKgrWqK', 'Raydium')        # CLMM
+register_decoder('whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc', 'Orca')           # Whirlpools
+register_decoder('9W959DqEETiGZocYWCQPaJ6sBmUzgfxXfqGeTEdp3aQP', 'Orca')           # Token swap v2
+register_decoder('6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ14M5uBEwF6P', 'Pump.fun', pump_fun_legs)
+register_decoder('pAMMBay6oceH9fJKBRHGP5D4bD4sWpmSwMn52FMfXEA', 'Pump.fun AMM')
+register_decoder('LBUZKhRxPF3XUpBCjp4YzTKgLccjZhTSDM9YuVaPwxo', 'Meteora')         # DLMM
+
+
+def _trade(owner, venue, route, changes):
+    # Net per mint over the whole swap, so route hops through the trader's own accounts cancel out
+    paid = min(changes.items(), key=lambda item: item[1][0])
+    received = max(changes.items(), key=lambda item: item[1][0])
+    if paid[1][0] >= 0 or received[1][0] <= 0:
+        return None
+    return SwapTrade(
+        owner, venue, route,
+        paid[0], -paid[1][0], paid[1][1],
+        received[0], received[1][0], received[1][1],
+    )
+
+
+def decode_swaps(txn):
+    """Every swap the transaction's signers made, decoded in one pass over its instructions.
+
+    Each top-level instruction is taken together with its inner instructions.
+    The first registered DEX program in that tree names the venue, and the
+    DEX programs it routes through make up the route. The decoder's legs are
+    netted per signer and mint, giving one SwapTrade per signer per swap.
+    """
+    if txn is None or not txn.meta or txn.meta.get('err') is not None:
+        return []
+    ctx = None
+    inner_by_index = {group.get('index'): group.get('instructions') or () for group in txn.inner_instructions}
+    trades = []
+    for index, instruction in enumerate(txn.instructions):
+        inner = inner_by_index.get(index, ())
+        programs = [instruction.get('programId')] + [child.get('programId') for child in inner]
+        venues = []
+        decoded = None
+        for program_id in programs:
+            entry = DEX_DECODERS.get(program_id)
+            if entry is None:
+                continue
+            if decoded is None:
+                decoded = entry
+            if entry[0] not in venues:
+                venues.append(entry[0])
+        if decoded is None:
+            continue
+
+        if ctx is None:
+            ctx = SwapContext(txn)
+        venue, decoder = decoded
+        # For a direct call the decoder gets the DEX instruction; under a router it gets the first DEX CPI
+        dex_instruction = instruction if instruction.get('programId') in DEX_DECODERS else next(
+            child for child in inner if child.get('programId') in DEX_DECODERS)
+        changes = {}
+        for owner, mint, amount, decimals in decoder(ctx, dex_instruction, inner):
+            if owner not in txn.signers:
+                continue
+            change = changes.setdefault(owner, {}).setdefault(mint, [0, decimals])
+            change[0] += amount
+        route = tuple(venues[1:])
+        for owner, by_mint in changes.items():
+            trade = _trade(owner, venue, route, by_mint)
+            if trade is not None:
+                trades.append(trade)
+    return trades
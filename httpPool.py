@@ -0,0 +1,65 @@
+import os
+import aiohttp
+
+# Total and per-host keep-alive connection limits for the shared session
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '32'))
+HTTP_POOL_PER_HOST = int(os.getenv('HTTP_POOL_PER_HOST', '16'))
+
+# How long resolved hostnames and idle connections are kept
+HTTP_DNS_CACHE_SECONDS = int(os.getenv('HTTP_DNS_CACHE_SECONDS', '300'))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv('HTTP_KEEPALIVE_SECONDS', '60'))
+
+# Connection reuse versus new (TCP + TLS) handshakes since start
+connection_stats = {
+    'new_connections': 0,
+    'reused_connections': 0,
+    'dns_cache_hits': 0,
+    'dns_lookups': 0,
+}
+
+session = None
+
+
+def _count(name):
+    async def on_event(session, context, params):
+        connection_stats[name] += 1
+    return on_event
+
+
+def _trace_config():
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(_count('new_connections'))
+    trace_config.on_connection_reuseconn.append(_count('reused_connections'))
+    trace_config.on_dns_cache_hit.append(_count('dns_cache_hits'))
+    trace_config.on_dns_resolvehost_end.append(_count('dns_lookups'))
+    return trace_config
+
+
+def get_session():
+    """The process-wide HTTP session used for RPC calls, websockets and metadata downloads."""
+    global session
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_POOL_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+        )
+        session = aiohttp.ClientSession(connector=connector, trace_configs=[_trace_config()])
+    return session
+
+
+def connection_reuse_summary():
+    requests = connection_stats['new_connections'] + connection_stats['reused_connections']
+    reuse = connection_stats['reused_connections'] / requests * 100 if requests else 0.0
+    return (
+        f"{connection_stats['reused_connections']} reused / {connection_stats['new_connections']} new connections "
+        f"({reuse:.1f}% reuse), {connection_stats['dns_cache_hits']} DNS cache hits"
+    )
+
+
+async def close_session():
+    global session
+    if session is not None:
+        await session.close()
+        session = None
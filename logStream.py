@@ -0,0 +1,92 @@
+import os
+import json
+import asyncio
+import aiohttp
+from httpPool import get_session
+from logSetup import get_logger
+
+# WebSocket endpoint for logsSubscribe; leave unset for RPCs without websockets
+SOLANA_WS_URL = os.getenv('SOLANA_WS_URL')
+
+# Commitment for log notifications, matching what the signature polling reads
+WS_COMMITMENT = os.getenv('WS_COMMITMENT', 'finalized')
+
+# Upper bound on the reconnect backoff
+WS_RECONNECT_MAX_SECONDS = float(os.getenv('WS_RECONNECT_MAX_SECONDS', '60'))
+
+logger = get_logger(__name__)
+
+
+class LogStream:
+    """Subscribes to logsSubscribe with `mentions` for each watched address.
+
+    `on_activity(address)` is called for every log notification and
+    `on_connect()` after each (re)connect once all subscriptions were sent,
+    so callers can backfill from their stored cursors. `connected` and
+    `disconnected` let a poll loop take over while the socket is down.
+    """
+
+    def __init__(self, ws_url, addresses, on_activity, on_connect):
+        self.ws_url = ws_url
+        self.addresses = list(addresses)
+        self.on_activity = on_activity
+        self.on_connect = on_connect
+        self.connected = asyncio.Event()
+        self.disconnected = asyncio.Event()
+        self.disconnected.set()
+        # JSON-RPC request id -> address, then subscription id -> address
+        self.pending_subscriptions = {}
+        self.subscriptions = {}
+
+    async def _subscribe(self, ws):
+        self.pending_subscriptions.clear()
+        self.subscriptions.clear()
+        for request_id, address in enumerate(self.addresses, start=1):
+            self.pending_subscriptions[request_id] = address
+            await ws.send_json({
+                'jsonrpc': '2.0',
+                'id': request_id,
+                'method': 'logsSubscribe',
+                'params': [{'mentions': [address]}, {'commitment': WS_COMMITMENT}],
+            })
+
+    async def _handle(self, data):
+        if data.get('method') == 'logsNotification':
+            params = data.get('params', {})
+            address = self.subscriptions.get(params.get('subscription'))
+            if address is not None:
+                await self.on_activity(address)
+        elif 'id' in data:
+            address = self.pending_subscriptions.pop(data['id'], None)
+            if address is None:
+                return
+            if 'result' in data:
+                self.subscriptions[data['result']] = address
+            else:
+                logger.warning("logsSubscribe failed", extra={'wallet': address, 'error': data.get('error')})
+
+    async def run(self):
+        backoff = 1
+        while True:
+            try:
+                async with get_session().ws_connect(self.ws_url, heartbeat=30) as ws:
+                    await self._subscribe(ws)
+                    logger.info("Streaming logs", extra={'addresses': len(self.addresses), 'url': self.ws_url})
+                    self.disconnected.clear()
+                    self.connected.set()
+                    backoff = 1
+                    # Backfill whatever landed while the socket was down
+                    asyncio.ensure_future(self.on_connect())
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            await self._handle(json.loads(msg.data))
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+                logger.info("Log stream closed")
+            except Exception as e:
+                logger.warning("Log stream error", extra={'error': e})
+            self.connected.clear()
+            self.disconnected.set()
+            logger.info("Falling back to polling until the log stream reconnects", extra={'retry_in': backoff})
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, WS_RECONNECT_MAX_SECONDS)
@@ -0,0 +1,157 @@
+import os
+import time
+import bisect
+from contextlib import contextmanager
+from logSetup import get_logger
+
+# Local /metrics endpoint in the Prometheus text format; METRICS_PORT=0 turns it off
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+logger = get_logger(__name__)
+
+registry = []
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_label_text(self.labels, label_values)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, *label_values):
+        self.values[label_values] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        state = self.values.get(label_values)
+        if state is None:
+            # Per-bucket counts (the last one is +Inf), sum, count
+            state = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        names = self.labels + ('le',)
+        for label_values, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_label_text(names, label_values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, label_values)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    'walletbot_stage_seconds',
+    'Latency of each pipeline stage (signatures, fetch, block, match, decode, classify, send).',
+    ['stage'],
+)
+RPC_ERRORS = Counter('walletbot_rpc_errors_total', 'RPC calls that failed, by method.', ['method'])
+RPC_RATE_LIMITED = Counter('walletbot_rpc_rate_limited_total', 'RPC calls answered with HTTP 429, by method.', ['method'])
+RPC_FAILOVERS = Counter('walletbot_rpc_failovers_total', 'RPC requests retried on another endpoint, by method.', ['method'])
+RPC_HEDGES = Counter('walletbot_rpc_hedged_total', 'Slow RPC requests also sent to a second endpoint, by method.', ['method'])
+RPC_BUDGET_WAIT = Histogram('walletbot_rpc_budget_wait_seconds', 'Time RPC requests waited for the request budget.')
+RPC_ENDPOINT_LATENCY = Gauge('walletbot_rpc_endpoint_latency_seconds', 'Smoothed response time per RPC endpoint.', ['endpoint'])
+RPC_ENDPOINT_SLOT_LAG = Gauge('walletbot_rpc_endpoint_slot_lag', 'Slots behind the freshest RPC endpoint.', ['endpoint'])
+SIGNATURES_DEDUPED = Counter('walletbot_signatures_deduped_total', 'Signatures skipped because they were already processed.')
+SIGNATURES_DROPPED = Counter(
+    'walletbot_signatures_dropped_total',
+    'Signatures given up on: transaction not found, fetch or processing error.',
+    ['reason'],
+)
+SIGNATURES_RETRIED = Counter(
+    'walletbot_signatures_retried_total',
+    'Transactions left for a later run after an RPC or network error, with the cursor before them.',
+)
+CATCHUP_TRUNCATED = Counter('walletbot_catchup_truncated_total', 'Catch-ups cut off at MAX_CATCHUP_SIGNATURES.')
+ALERTS = Counter('walletbot_alerts_total', 'Telegram alerts by outcome (sent, merged, dropped).', ['outcome'])
+WALLET_LAG = Gauge(
+    'walletbot_wallet_lag_seconds',
+    'Seconds between the block time of the last processed transaction and its processing, per wallet.',
+    ['wallet'],
+)
+WALLET_POLL_INTERVAL = Gauge('walletbot_wallet_poll_interval_seconds', 'Current adaptive poll interval, per wallet.', ['wallet'])
+WALLET_LAST_POLL = Gauge('walletbot_wallet_last_poll_timestamp_seconds', 'Unix time of the last completed poll, per wallet.', ['wallet'])
+BLOCKS_SCANNED = Counter('walletbot_blocks_scanned_total', 'Slots walked in block scanning mode, by outcome (scanned, skipped, failed).', ['outcome'])
+BLOCK_SCAN_LAG = Gauge('walletbot_block_scan_lag_slots', 'Slots between the last scanned block and the confirmed tip.')
+STARTUP_SECONDS = Gauge('walletbot_startup_seconds', 'Duration of each startup phase, up to the first completed poll.', ['phase'])
+
+
+def render_metrics():
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics on host:port; returns the runner to clean up, or None when disabled."""
+    if not port:
+        return None
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=render_metrics(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.warning("Metrics endpoint not started", extra={'host': host, 'port': port, 'error': e})
+        await runner.cleanup()
+        return None
+    logger.info("Serving metrics", extra={'url': f"http://{host}:{port}/metrics"})
+    return runner
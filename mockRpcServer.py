@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import glob
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from aiohttp import web
+from base58Codec import b58encode
+
+# A local Solana JSON-RPC stand-in for exercising the RPC pool: serves
+# getSlot, getSignaturesForAddress, getTransaction, getBlock, getAccountInfo and
+# getTokenAccountsByOwner (single or batched) from a recording made with
+# RPC_RECORD_PATH, or from the fixtures repeated under fresh signatures, with
+# configurable latency, 429s, 5xx errors and slot lag.
+#
+#   python mockRpcServer.py --port 8899 --latency-ms 40 --rate-limit 0.1
+#   python mockRpcServer.py --port 8900 --latency-ms 300 --slot-lag 50
+#   SOLANA_RPC_URL=http://127.0.0.1:8899,http://127.0.0.1:8900 python walletTradeAlert.py
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'transactions')
+BASE_SLOT = 300_000_000
+TOKEN_PROGRAM_ID = 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA'
+
+
+def synthetic_recording(count):
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.json'))):
+        with open(path) as f:
+            fixtures.append(json.load(f))
+    wallet = fixtures[0]['transaction']['message']['accountKeys'][0]['pubkey']
+    transactions = {}
+    for i in range(count):
+        signature = b58encode(hashlib.sha512(f'mock{i}'.encode()).digest())
+        transactions[signature] = dict(fixtures[i % len(fixtures)], slot=BASE_SLOT + i)
+    return {
+        'signatures': {wallet: list(reversed(list(transactions)))},
+        'transactions': transactions,
+        'token_accounts': {},
+        'accounts': {},
+    }
+
+
+class RpcFault(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class MockRpc:
+    def __init__(self, recording, latency_ms=0, jitter_ms=0, rate_limit=0.0, error_rate=0.0,
+                 slot_lag=0, reject_batches=False, skip_rate=0.0):
+        self.recording = recording
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.slot_lag = slot_lag
+        self.reject_batches = reject_batches
+        self.skip_rate = skip_rate
+        self.started = time.monotonic()
+        self.requests = 0
+        # slot -> signatures of the recorded transactions in its block
+        self.blocks = {}
+        for signature, txn in recording['transactions'].items():
+            if txn is not None and txn.get('slot') is not None:
+                self.blocks.setdefault(txn['slot'], []).append(signature)
+
+    def slot(self):
+        return BASE_SLOT + int((time.monotonic() - self.started) / 0.4) - self.slot_lag
+
+    def _account(self, data, owner=TOKEN_PROGRAM_ID):
+        return {
+            'data': [data, 'base64'],
+            'executable': False,
+            'lamports': 2039280,
+            'owner': owner,
+            'rentEpoch': 0,
+            'space': len(data) * 3 // 4,
+        }
+
+    def _signatures(self, address, config):
+        signatures = self.recording['signatures'].get(address, [])
+        before, until = config.get('before'), config.get('until')
+        limit = config.get('limit', 1000)
+        start = signatures.index(before) + 1 if before in signatures else 0
+        page = []
+        for signature in signatures[start:]:
+            if signature == until or len(page) >= limit:
+                break
+            txn = self.recording['transactions'].get(signature) or {}
+            page.append({
+                'signature': signature,
+                'slot': txn.get('slot', BASE_SLOT),
+                'err': None,
+                'memo': None,
+                'blockTime': txn.get('blockTime'),
+                'confirmationStatus': 'finalized',
+            })
+        return page
+
+    def _block(self, slot):
+        if slot > self.slot():
+            raise RpcFault(-32004, f"Block not available for slot {slot}")
+        signatures = self.blocks.get(slot, [])
+        # Empty slots are skipped by their leader at skip_rate, the same way on every request
+        if not signatures and random.Random(slot).random() < self.skip_rate:
+            raise RpcFault(-32007, f"Slot {slot} was skipped, or missing due to ledger jump to recent snapshot")
+        transactions = []
+        block_time = None
+        for signature in signatures:
+            txn = self.recording['transactions'][signature]
+            block_time = block_time or txn.get('blockTime')
+            transactions.append({
+                'transaction': dict(txn['transaction'], signatures=[signature]),
+                'meta': txn.get('meta'),
+                'version': txn.get('version', 'legacy'),
+            })
+        return {
+            'blockHeight': slot,
+            'blockTime': block_time or int(time.time()),
+            'blockhash': b58encode(hashlib.sha256(f'block{slot}'.encode()).digest()),
+            'parentSlot': slot - 1,
+            'previousBlockhash': b58encode(hashlib.sha256(f'block{slot - 1}'.encode()).digest()),
+            'transactions': transactions,
+        }
+
+    def result(self, method, params):
+        context = {'slot': self.slot()}
+        if method == 'getSlot':
+            return self.slot()
+        if method == 'getSignaturesForAddress':
+            return self._signatures(params[0], params[1] if len(params) > 1 else {})
+        if method == 'getTransaction':
+            return self.recording['transactions'].get(params[0])
+        if method == 'getBlock':
+            return self._block(params[0])
+        if method == 'getAccountInfo':
+            data = self.recording['accounts'].get(params[0])
+            return {'context': context, 'value': self._account(data) if data is not None else None}
+        if method == 'getTokenAccountsByOwner':
+            program_id = params[1].get('programId')
+            accounts = self.recording['token_accounts'].get(params[0], [])
+            return {'context': context, 'value': [
+                {'pubkey': entry[0], 'account': self._account(entry[1], program_id)}
+                for entry in accounts if (entry[2] if len(entry) > 2 else TOKEN_PROGRAM_ID) == program_id
+            ]}
+        raise KeyError(method)
+
+    def answer(self, request):
+        try:
+            return {'jsonrpc': '2.0', 'id': request.get('id'),
+                    'result': self.result(request['method'], request.get('params', []))}
+        except RpcFault as e:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {'code': e.code, 'message': str(e)}}
+        except KeyError:
+            return {'jsonrpc': '2.0', 'id': request.get('id'),
+                    'error': {'code': -32601, 'message': 'Method not found'}}
+
+    async def handle(self, request):
+        self.requests += 1
+        payload = await request.json()
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if random.random() < self.rate_limit:
+            return web.Response(status=429, text='Too Many Requests', headers={'Retry-After': '1'})
+        if random.random() < self.error_rate:
+            return web.Response(status=503, text='Service Unavailable')
+        if isinstance(payload, list):
+            if self.reject_batches:
+                return web.Response(status=413, text='Batch requests are not supported')
+            return web.json_response([self.answer(item) for item in payload])
+        return web.json_response(self.answer(payload))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--recording', help='file written with RPC_RECORD_PATH; fixtures are used otherwise')
+    parser.add_argument('--transactions', type=int, default=5000, help='synthetic transactions without a recording')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--slot-lag', type=int, default=0, help='slots this endpoint reports behind the others')
+    parser.add_argument('--reject-batches', action='store_true')
+    parser.add_argument('--skip-rate', type=float, default=0.0, help='fraction of empty slots reported as skipped')
+    args = parser.parse_args()
+
+    if args.recording:
+        from rpcReplay import load_recording
+        recording = load_recording(args.recording)
+    else:
+        recording = synthetic_recording(args.transactions)
+    for address, signatures in recording['signatures'].items():
+        print(f"Serving {len(signatures)} signatures for {address}", file=sys.stderr)
+
+    rpc = MockRpc(recording, args.latency_ms, args.jitter_ms, args.rate_limit, args.error_rate,
+                  args.slot_lag, args.reject_batches, args.skip_rate)
+    app = web.Application()
+    app.router.add_post('/', rpc.handle)
+    web.run_app(app, host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
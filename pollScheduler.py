@@ -0,0 +1,103 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+from logSetup import get_logger
+from metrics import WALLET_POLL_INTERVAL
+
+# A wallet that just had activity is polled again after this long
+POLL_MIN_INTERVAL_SECONDS = float(os.getenv('POLL_MIN_INTERVAL_SECONDS', '5'))
+
+# Ceiling for the exponential backoff of dormant wallets
+POLL_MAX_INTERVAL_SECONDS = float(os.getenv('POLL_MAX_INTERVAL_SECONDS', '900'))
+
+# Interval multiplier for every poll that finds nothing new
+POLL_BACKOFF_FACTOR = float(os.getenv('POLL_BACKOFF_FACTOR', '2'))
+
+# Polls running at once; the RPC request budget (RPC_REQUESTS_PER_SECOND) paces them further
+POLL_CONCURRENCY = int(os.getenv('POLL_CONCURRENCY', '16'))
+
+# Random spread applied to every interval so wallets do not poll in lockstep
+POLL_JITTER = 0.1
+
+logger = get_logger(__name__)
+
+
+class PollScheduler:
+    """Polls each wallet on its own adaptive interval, hot wallets first.
+
+    A poll that moves a wallet's cursor resets its interval to the minimum;
+    each poll that finds nothing multiplies it by POLL_BACKOFF_FACTOR up to
+    the maximum. Wallets that are due move to a ready queue ordered by
+    deadline (due time plus their interval), and at most `concurrency` polls
+    run at once. When the RPC budget is the bottleneck, hot wallets with
+    short intervals therefore go ahead of dormant ones that can wait.
+    """
+
+    def __init__(self, poll, wallets, initial_interval, min_interval=POLL_MIN_INTERVAL_SECONDS,
+                 max_interval=POLL_MAX_INTERVAL_SECONDS, concurrency=POLL_CONCURRENCY):
+        self.poll = poll
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.concurrency = concurrency
+        initial_interval = min(max(initial_interval, min_interval), self.max_interval)
+        self.intervals = {wallet.address: initial_interval for wallet in wallets}
+        # (due time, sequence, wallet); the sequence keeps ties in insertion order
+        self.queue = []
+        # (deadline, sequence, wallet) for wallets that are due
+        self.ready = []
+        self.sequence = 0
+        self.running = set()
+        self.wakeup = None
+        now = time.monotonic()
+        for wallet in wallets:
+            self._push(wallet, now)
+
+    def _push(self, wallet, due):
+        self.sequence += 1
+        heapq.heappush(self.queue, (due, self.sequence, wallet))
+
+    def _next_interval(self, wallet, active):
+        interval = self.intervals[wallet.address]
+        interval = self.min_interval if active else min(interval * POLL_BACKOFF_FACTOR, self.max_interval)
+        self.intervals[wallet.address] = interval
+        WALLET_POLL_INTERVAL.set(interval, wallet.address)
+        return interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+    async def _run_poll(self, wallet):
+        cursor = wallet.last_signature
+        try:
+            await self.poll(wallet)
+        finally:
+            active = wallet.last_signature != cursor
+            self._push(wallet, time.monotonic() + self._next_interval(wallet, active))
+            self.running.discard(wallet.address)
+            self.wakeup.set()
+
+    async def run(self):
+        self.wakeup = asyncio.Event()
+        tasks = set()
+        try:
+            while True:
+                self.wakeup.clear()
+                now = time.monotonic()
+                while self.queue and self.queue[0][0] <= now:
+                    due, sequence, wallet = heapq.heappop(self.queue)
+                    heapq.heappush(self.ready, (due + self.intervals[wallet.address], sequence, wallet))
+                while self.ready and len(self.running) < self.concurrency:
+                    _, _, wallet = heapq.heappop(self.ready)
+                    self.running.add(wallet.address)
+                    task = asyncio.ensure_future(self._run_poll(wallet))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                if self.ready:
+                    logger.debug("Poll backlog", extra={'overdue': len(self.ready)})
+                timeout = max(self.queue[0][0] - now, 0) if self.queue and not self.ready else None
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in tasks:
+                task.cancel()
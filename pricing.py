@@ -0,0 +1,168 @@
+import os
+import asyncio
+import aiohttp
+from balanceDeltas import compute_balance_deltas
+from httpPool import get_session
+from logSetup import get_logger
+from ttlCache import TtlLruCache
+from txnParser import loads
+
+# How long a derived or fetched price is trusted
+PRICE_TTL_SECONDS = float(os.getenv('PRICE_TTL_SECONDS', '300'))
+PRICE_CACHE_SIZE = int(os.getenv('PRICE_CACHE_SIZE', '10000'))
+
+# How long a mint the external source had no price for (or failed on) is not asked again
+PRICE_MISS_TTL_SECONDS = float(os.getenv('PRICE_MISS_TTL_SECONDS', '60'))
+
+# Optional external price source for mints no processed swap has priced yet ("jupiter" or unset)
+PRICE_SOURCE = os.getenv('PRICE_SOURCE')
+JUPITER_PRICE_URL = os.getenv('JUPITER_PRICE_URL', 'https://api.jup.ag/price/v2?ids={mint}')
+
+# Alerts wait for their price, so a slow price API must not hold them up for long
+PRICE_FETCH_TIMEOUT_SECONDS = float(os.getenv('PRICE_FETCH_TIMEOUT_SECONDS', '3'))
+
+WSOL_MINT = 'So11111111111111111111111111111111111111112'
+LAMPORTS_PER_SOL = 10 ** 9
+
+# Stablecoins treated as exactly one USD
+USD_STABLECOINS = {
+    'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v',  # USDC
+    'Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB',  # USDT
+}
+
+logger = get_logger(__name__)
+
+
+async def jupiter_price_source(mint):
+    timeout = aiohttp.ClientTimeout(total=PRICE_FETCH_TIMEOUT_SECONDS)
+    async with get_session().get(JUPITER_PRICE_URL.format(mint=mint), timeout=timeout) as resp:
+        if resp.status != 200:
+            return None
+        data = loads(await resp.read()).get('data') or {}
+    price = (data.get(mint) or {}).get('price')
+    return float(price) if price is not None else None
+
+
+PRICE_SOURCES = {
+    'jupiter': jupiter_price_source,
+}
+
+
+class PriceBook:
+    """USD prices derived from the swaps the bots already process.
+
+    Each transaction's balance deltas are grouped per owner; an owner that
+    traded exactly one token against SOL or a stablecoin prices that token.
+    Prices live in a per-mint TTL cache. Only on a miss is the optional
+    external source asked, with one request in flight per mint; a mint it
+    has no price for is remembered as such for PRICE_MISS_TTL_SECONDS.
+    """
+
+    def __init__(self, external_source=None):
+        self.external_source = external_source
+        self.usd_prices = TtlLruCache(PRICE_CACHE_SIZE, PRICE_TTL_SECONDS)
+        # Prices quoted in SOL, for tokens seen before any SOL/USD swap
+        self.sol_prices = TtlLruCache(PRICE_CACHE_SIZE, PRICE_TTL_SECONDS)
+        self.in_flight = {}
+
+    def _owner_legs(self, txn):
+        meta = txn.meta or {}
+        legs = {}
+        for change in compute_balance_deltas(meta, txn.account_keys):
+            if change.delta:
+                legs.setdefault(change.owner, {})[change.mint] = change.delta / (10 ** change.decimals)
+
+        # Native SOL leg of each signer, net of the fee, when it has no wrapped SOL or stablecoin leg
+        # (rent refunds from closed accounts would otherwise look like a second quote leg)
+        pre_lamports = meta.get('preBalances') or []
+        post_lamports = meta.get('postBalances') or []
+        for idx, key in enumerate(txn.account_keys[:len(post_lamports)]):
+            owner_legs = legs.get(key, {})
+            if key not in txn.signers or any(mint == WSOL_MINT or mint in USD_STABLECOINS for mint in owner_legs):
+                continue
+            lamports = post_lamports[idx] - pre_lamports[idx] + (meta.get('fee', 0) if idx == 0 else 0)
+            if lamports and key in legs:
+                legs[key][WSOL_MINT] = lamports / LAMPORTS_PER_SOL
+        return legs
+
+    def observe_transaction(self, txn):
+        """Update prices from the SOL/stablecoin legs of one processed transaction."""
+        owner_legs = self._owner_legs(txn)
+        for legs in owner_legs.values():
+            quotes = [mint for mint in legs if mint == WSOL_MINT or mint in USD_STABLECOINS]
+            bases = [mint for mint in legs if mint not in quotes]
+            if len(quotes) != 1 or len(bases) != 1:
+                continue
+            quote, base = quotes[0], bases[0]
+            base_amount, quote_amount = legs[base], legs[quote]
+            if base_amount * quote_amount >= 0:
+                continue  # Both legs moved the same way; not a swap
+            price = abs(quote_amount / base_amount)
+            if quote in USD_STABLECOINS:
+                self.usd_prices.set(base, price)
+            else:
+                self.sol_prices.set(base, price)
+
+        # SOL itself is priced from SOL/stablecoin swaps
+        for legs in owner_legs.values():
+            if len(legs) == 2 and WSOL_MINT in legs:
+                stable = next((mint for mint in legs if mint in USD_STABLECOINS), None)
+                if stable and legs[WSOL_MINT] * legs[stable] < 0:
+                    self.usd_prices.set(WSOL_MINT, abs(legs[stable] / legs[WSOL_MINT]))
+
+    def cached_price(self, mint):
+        if mint in USD_STABLECOINS:
+            return 1.0
+        price = self.usd_prices.get(mint)[1]
+        if price is not None:
+            return price
+        hit, sol_price = self.sol_prices.get(mint)
+        if hit:
+            sol_usd = self.cached_price(WSOL_MINT)
+            if sol_usd is not None:
+                return sol_price * sol_usd
+        return None
+
+    async def get_usd_price(self, mint):
+        """USD price for `mint`, from the cache or (on a miss) the external source."""
+        price = self.cached_price(mint)
+        if price is not None or self.external_source is None:
+            return price
+        # If the token is quoted in SOL, only SOL/USD has to be fetched
+        if mint != WSOL_MINT and self.sol_prices.get(mint)[0]:
+            await self._fetch(WSOL_MINT)
+            return self.cached_price(mint)
+        return await self._fetch(mint)
+
+    async def _fetch(self, mint):
+        hit, price = self.usd_prices.get(mint)
+        if hit:
+            return price  # Possibly a recent miss, which is not asked for again until it expires
+        future = self.in_flight.get(mint)
+        if future is not None:
+            return await future
+        future = self.in_flight[mint] = asyncio.get_running_loop().create_future()
+        price = None
+        try:
+            price = await self.external_source(mint)
+        except Exception as e:
+            logger.warning("Error fetching price", extra={'mint': mint, 'error': e})
+        finally:
+            if price is not None:
+                self.usd_prices.set(mint, price)
+            elif not self.usd_prices.get(mint)[0]:
+                # Unless a swap priced the mint meanwhile
+                self.usd_prices.set(mint, None, PRICE_MISS_TTL_SECONDS)
+            del self.in_flight[mint]
+            future.set_result(price)
+        return price
+
+
+def format_usd(amount, price):
+    """' (≈ $1,234.56 USD)' for alert messages, or '' when the price is unknown."""
+    if price is None:
+        return ''
+    return f" (≈ ${amount * price:,.2f} USD)"
+
+
+price_book = PriceBook(PRICE_SOURCES.get(PRICE_SOURCE))
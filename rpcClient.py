@@ -0,0 +1,103 @@
+import os
+import asyncio
+from solders.rpc.responses import (
+    GetAccountInfoResp,
+    GetSignaturesForAddressResp,
+    GetTokenAccountsByOwnerResp,
+)
+from transactionFetcher import TransactionFetcher
+from metrics import RPC_ERRORS
+from rpcPool import RpcPool, RpcError, SOLANA_RPC_URL
+from txnParser import loads
+
+# Cap on RPC requests in flight across every watched wallet
+MAX_INFLIGHT_RPC = int(os.getenv('MAX_INFLIGHT_RPC', '8'))
+
+# getBlock errors for a slot that has no block: skipped by its leader, or missing from long-term storage
+SKIPPED_SLOT_ERRORS = {-32007, -32009}
+
+
+class SharedRpcClient:
+    """The Solana RPC client shared by every wallet, over the pooled HTTP session.
+
+    Exposes the AsyncClient calls the bots use, returning the same solders
+    response types, with a cap on in-flight requests. Transaction details go
+    through the batching fetcher instead, so signatures pending across all
+    wallets share JSON-RPC batch round trips. `rpc_url` may list several
+    comma-separated endpoints; requests are routed by the RpcPool.
+    """
+
+    def __init__(self, rpc_url=SOLANA_RPC_URL, max_inflight=MAX_INFLIGHT_RPC):
+        self.pool = RpcPool(rpc_url)
+        self.fetcher = TransactionFetcher(self.pool)
+        self.slots = asyncio.Semaphore(max_inflight)
+        self.request_id = 0
+
+    async def _call(self, method, params):
+        self.request_id += 1
+        payload = {'jsonrpc': '2.0', 'id': self.request_id, 'method': method, 'params': params}
+        async with self.slots:
+            text = (await self.pool.post(payload, method)).decode()
+        error = loads(text).get('error')
+        if error is not None:
+            RPC_ERRORS.inc(method)
+            raise RpcError(f"{method}: {error}")
+        return text
+
+    async def get_signatures_for_address(self, address, before=None, until=None, limit=None):
+        config = {}
+        if before is not None:
+            config['before'] = str(before)
+        if until is not None:
+            config['until'] = str(until)
+        if limit is not None:
+            config['limit'] = limit
+        text = await self._call('getSignaturesForAddress', [str(address), config])
+        return GetSignaturesForAddressResp.from_json(text)
+
+    async def get_token_accounts_by_owner(self, owner, program_id):
+        text = await self._call('getTokenAccountsByOwner', [
+            str(owner), {'programId': str(program_id)}, {'encoding': 'base64'},
+        ])
+        return GetTokenAccountsByOwnerResp.from_json(text)
+
+    async def get_account_info(self, pubkey):
+        text = await self._call('getAccountInfo', [str(pubkey), {'encoding': 'base64'}])
+        return GetAccountInfoResp.from_json(text)
+
+    async def get_transaction_json(self, signature):
+        return await self.fetcher.get_transaction(signature)
+
+    async def get_slot(self, commitment='confirmed'):
+        text = await self._call('getSlot', [{'commitment': commitment}])
+        return loads(text)['result']
+
+    async def get_block_json(self, slot, commitment='confirmed'):
+        """Raw jsonParsed getBlock result with full transactions, or None for a slot without a block."""
+        self.request_id += 1
+        payload = {'jsonrpc': '2.0', 'id': self.request_id, 'method': 'getBlock', 'params': [slot, {
+            'encoding': 'jsonParsed',
+            'transactionDetails': 'full',
+            'rewards': False,
+            'maxSupportedTransactionVersion': 0,
+            'commitment': commitment,
+        }]}
+        async with self.slots:
+            response = loads(await self.pool.post(payload, 'getBlock'))
+        error = response.get('error')
+        if error is not None:
+            if error.get('code') in SKIPPED_SLOT_ERRORS:
+                return None
+            RPC_ERRORS.inc('getBlock')
+            raise RpcError(f"getBlock: {error}")
+        return response.get('result')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.fetcher.close()
+        await self.pool.close()
@@ -0,0 +1,304 @@
+import os
+import time
+import asyncio
+import aiohttp
+from urllib.parse import urlsplit
+from httpPool import get_session
+from logSetup import get_logger
+from metrics import (
+    RPC_ERRORS, RPC_RATE_LIMITED, RPC_FAILOVERS, RPC_HEDGES, RPC_BUDGET_WAIT,
+    RPC_ENDPOINT_LATENCY, RPC_ENDPOINT_SLOT_LAG,
+)
+from txnParser import loads
+
+# One endpoint, or several separated by commas
+SOLANA_RPC_URL = os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
+
+# A getTransaction still unanswered after this long is also sent to the next best endpoint; 0 disables
+RPC_HEDGE_AFTER_MS = float(os.getenv('RPC_HEDGE_AFTER_MS', '400'))
+
+# Seconds between getSlot probes used for latency and freshness scoring
+RPC_HEALTH_CHECK_SECONDS = float(os.getenv('RPC_HEALTH_CHECK_SECONDS', '10'))
+
+# Endpoints tried per request before the error is raised
+RPC_MAX_ATTEMPTS = int(os.getenv('RPC_MAX_ATTEMPTS', '4'))
+
+# Backoff for an endpoint that answers 429, doubled per consecutive 429 unless it sends Retry-After
+RPC_BACKOFF_BASE_SECONDS = float(os.getenv('RPC_BACKOFF_BASE_SECONDS', '1'))
+RPC_BACKOFF_MAX_SECONDS = float(os.getenv('RPC_BACKOFF_MAX_SECONDS', '60'))
+
+RPC_REQUEST_TIMEOUT_SECONDS = float(os.getenv('RPC_REQUEST_TIMEOUT_SECONDS', '30'))
+
+# Global request budget across all endpoints (each batched call counts); 0 means unlimited
+RPC_REQUESTS_PER_SECOND = float(os.getenv('RPC_REQUESTS_PER_SECOND', '0'))
+RPC_BURST = float(os.getenv('RPC_BURST', '10'))
+
+# Weight of the newest sample in the latency and error-rate averages
+HEALTH_EWMA_ALPHA = 0.2
+
+# Latency assumed for an endpoint that has not answered yet
+UNMEASURED_LATENCY_SECONDS = 0.25
+
+# Approximate slot time; a lagging endpoint is penalised by how far behind the tip it is
+SLOT_SECONDS = 0.4
+
+logger = get_logger(__name__)
+
+
+class RpcError(Exception):
+    pass
+
+
+class RpcHttpError(RpcError):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self):
+        return self.status == 429 or self.status >= 500
+
+
+class RpcUnavailable(RpcError):
+    pass
+
+
+# Failures of the RPC or the network rather than of the transaction at hand; work hit by one is retried later.
+# A JSON-RPC error body or a 4xx answers the same way every time, so plain RpcError and RpcHttpError are not here;
+# RpcPool.post raises RpcUnavailable once 429s and 5xx have used up every attempt
+TRANSIENT_ERRORS = (RpcUnavailable, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+def parse_rpc_urls(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return [url.strip() for url in value if url and url.strip()]
+
+
+def _endpoint_name(url):
+    # Host only: provider API keys often live in the path or query string
+    parts = urlsplit(url)
+    return f"{parts.hostname}:{parts.port}" if parts.port else (parts.hostname or url)
+
+
+def _retry_after(resp):
+    try:
+        return float(resp.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestBudget:
+    """Paces requests to `rate` per second, allowing short bursts of up to `burst`.
+
+    Callers reserve their slot in arrival order, so waiting requests are
+    served first come, first served.
+    """
+
+    def __init__(self, rate=RPC_REQUESTS_PER_SECOND, burst=RPC_BURST):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.next_free = 0.0
+
+    async def acquire(self, cost=1):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        start = max(self.next_free, now - (self.burst - 1) / self.rate)
+        self.next_free = start + cost / self.rate
+        if start > now:
+            RPC_BUDGET_WAIT.observe(start - now)
+            await asyncio.sleep(start - now)
+
+
+class RpcEndpoint:
+    """One RPC URL and the health figures routing decisions are based on."""
+
+    def __init__(self, url):
+        self.url = url
+        self.name = _endpoint_name(url)
+        self.latency = None
+        self.error_rate = 0.0
+        self.slot = None
+        self.backoff_until = 0.0
+        self.rate_limit_streak = 0
+
+    def available(self, now=None):
+        return (now if now is not None else time.monotonic()) >= self.backoff_until
+
+    def record_success(self, latency):
+        self.latency = latency if self.latency is None else self.latency + HEALTH_EWMA_ALPHA * (latency - self.latency)
+        self.error_rate -= HEALTH_EWMA_ALPHA * self.error_rate
+        self.rate_limit_streak = 0
+        RPC_ENDPOINT_LATENCY.set(round(self.latency, 4), self.name)
+
+    def record_failure(self):
+        self.error_rate += HEALTH_EWMA_ALPHA * (1 - self.error_rate)
+
+    def record_rate_limit(self, retry_after=None):
+        self.record_failure()
+        if retry_after is None:
+            retry_after = min(RPC_BACKOFF_BASE_SECONDS * 2 ** self.rate_limit_streak, RPC_BACKOFF_MAX_SECONDS)
+        self.rate_limit_streak += 1
+        self.backoff_until = time.monotonic() + retry_after
+        logger.warning("RPC endpoint rate limited", extra={'endpoint': self.name, 'backoff': retry_after})
+
+    def score(self, best_slot=None):
+        """Expected seconds to a useful answer; lower is better."""
+        latency = self.latency if self.latency is not None else UNMEASURED_LATENCY_SECONDS
+        lag = best_slot - self.slot if best_slot is not None and self.slot is not None else 0
+        return latency * (1 + 4 * self.error_rate) + max(lag, 0) * SLOT_SECONDS
+
+    def __repr__(self):
+        return f"RpcEndpoint({self.name!r})"
+
+
+class RpcPool:
+    """Routes JSON-RPC requests across several endpoints by health.
+
+    Each request goes to the endpoint with the best score (latency, error
+    rate, slot lag) and fails over to the next one on 429, 5xx or a
+    connection error. An endpoint that answers 429 is skipped until its
+    backoff ends. Hedged requests are also sent to the runner-up endpoint
+    when the first has not answered within RPC_HEDGE_AFTER_MS, and the
+    first answer wins. Every request, retries and hedges included, is paced
+    by the shared RequestBudget.
+    """
+
+    def __init__(self, urls=SOLANA_RPC_URL, hedge_after_ms=RPC_HEDGE_AFTER_MS, budget=None):
+        self.endpoints = [RpcEndpoint(url) for url in parse_rpc_urls(urls)]
+        if not self.endpoints:
+            raise ValueError("No RPC endpoint configured")
+        self.hedge_after = hedge_after_ms / 1000
+        self.budget = budget if budget is not None else RequestBudget()
+        self.health_task = None
+        self.request_id = 0
+
+    def best_slot(self):
+        slots = [endpoint.slot for endpoint in self.endpoints if endpoint.slot is not None]
+        return max(slots) if slots else None
+
+    def ranked(self):
+        """Available endpoints, healthiest first."""
+        now = time.monotonic()
+        best_slot = self.best_slot()
+        return sorted((endpoint for endpoint in self.endpoints if endpoint.available(now)),
+                      key=lambda endpoint: endpoint.score(best_slot))
+
+    async def _post_to(self, endpoint, payload, method):
+        await self.budget.acquire(len(payload) if isinstance(payload, list) else 1)
+        start = time.monotonic()
+        timeout = aiohttp.ClientTimeout(total=RPC_REQUEST_TIMEOUT_SECONDS)
+        try:
+            async with get_session().post(endpoint.url, json=payload, timeout=timeout) as resp:
+                if resp.status == 429:
+                    RPC_RATE_LIMITED.inc(method)
+                    endpoint.record_rate_limit(_retry_after(resp))
+                    raise RpcHttpError(429, f"{method}: HTTP 429 from {endpoint.name}")
+                if resp.status >= 500:
+                    endpoint.record_failure()
+                    raise RpcHttpError(resp.status, f"{method}: HTTP {resp.status} from {endpoint.name}")
+                if resp.status >= 400:
+                    raise RpcHttpError(resp.status, f"{method}: HTTP {resp.status} from {endpoint.name}")
+                body = await resp.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            endpoint.record_failure()
+            raise RpcUnavailable(f"{method}: {endpoint.name} unreachable: {e!r}") from e
+        endpoint.record_success(time.monotonic() - start)
+        return body
+
+    async def _hedged(self, payload, method, primary, secondary):
+        pending = {asyncio.ensure_future(self._post_to(primary, payload, method))}
+        error = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_after)
+            if done:
+                return done.pop().result()
+
+            RPC_HEDGES.inc(method)
+            pending.add(asyncio.ensure_future(self._post_to(secondary, payload, method)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The slower request is abandoned, also when the caller is cancelled
+            for task in pending:
+                task.cancel()
+
+    async def _wait_for_endpoint(self):
+        wait = min(endpoint.backoff_until for endpoint in self.endpoints) - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(min(wait, RPC_BACKOFF_MAX_SECONDS))
+
+    async def post(self, payload, method, hedge=False):
+        """Send a JSON-RPC payload (a request or a batch) and return the raw response body."""
+        self._start_health_checks()
+        tried = set()
+        error = None
+        for _ in range(RPC_MAX_ATTEMPTS):
+            ranked = self.ranked()
+            if not ranked:
+                # Every endpoint is backing off; wait for the first one to come back
+                await self._wait_for_endpoint()
+                continue
+            candidates = [endpoint for endpoint in ranked if endpoint not in tried] or ranked
+            hedged = hedge and self.hedge_after > 0 and len(candidates) > 1
+            try:
+                if hedged:
+                    return await self._hedged(payload, method, candidates[0], candidates[1])
+                return await self._post_to(candidates[0], payload, method)
+            except RpcHttpError as e:
+                if not e.retryable:
+                    RPC_ERRORS.inc(method)
+                    raise
+                error = e
+            except RpcUnavailable as e:
+                error = e
+            tried.update(candidates[:2] if hedged else candidates[:1])
+            RPC_FAILOVERS.inc(method)
+            logger.debug("Retrying RPC request on another endpoint", extra={'method': method, 'error': error})
+        RPC_ERRORS.inc(method)
+        if isinstance(error, RpcHttpError):
+            raise RpcUnavailable(f"{method}: every attempt failed, last with {error}") from error
+        raise error or RpcUnavailable(f"{method}: no RPC endpoint available")
+
+    async def _check(self, endpoint):
+        self.request_id += 1
+        payload = {'jsonrpc': '2.0', 'id': self.request_id, 'method': 'getSlot', 'params': []}
+        try:
+            endpoint.slot = loads(await self._post_to(endpoint, payload, 'getSlot')).get('result')
+        except Exception as e:
+            logger.debug("RPC health check failed", extra={'endpoint': endpoint.name, 'error': e})
+
+    async def _health_loop(self):
+        while True:
+            # Endpoints that are backing off are left alone until their backoff ends
+            now = time.monotonic()
+            await asyncio.gather(*(self._check(endpoint) for endpoint in self.endpoints if endpoint.available(now)))
+            best_slot = self.best_slot()
+            for endpoint in self.endpoints:
+                if best_slot is not None and endpoint.slot is not None:
+                    RPC_ENDPOINT_SLOT_LAG.set(best_slot - endpoint.slot, endpoint.name)
+            await asyncio.sleep(RPC_HEALTH_CHECK_SECONDS)
+
+    def _start_health_checks(self):
+        # Slot freshness only matters when there is a choice of endpoint
+        if self.health_task is None and len(self.endpoints) > 1:
+            self.health_task = asyncio.ensure_future(self._health_loop())
+
+    def summary(self):
+        best_slot = self.best_slot()
+        return ', '.join(
+            f"{endpoint.name} score {endpoint.score(best_slot) * 1000:.0f} ms"
+            f"{'' if endpoint.available() else ' (backing off)'}"
+            for endpoint in self.endpoints
+        )
+
+    async def close(self):
+        if self.health_task is not None:
+            self.health_task.cancel()
+            self.health_task = None
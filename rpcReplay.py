@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import base64
+import asyncio
+from collections import namedtuple
+from tokenTransfers import TOKEN_PROGRAM_ID
+
+# Record every RPC response the bots receive into this file (see RecordingRpcClient)
+RPC_RECORD_PATH = os.getenv('RPC_RECORD_PATH')
+
+# Minimal stand-ins for the solders response types; the bots only read these attributes
+RpcResponse = namedtuple('RpcResponse', ['value'])
+SignatureInfo = namedtuple('SignatureInfo', ['signature', 'slot', 'block_time', 'err'])
+KeyedAccount = namedtuple('KeyedAccount', ['pubkey', 'account'])
+AccountData = namedtuple('AccountData', ['data'])
+
+
+def _empty_recording():
+    return {
+        'signatures': {},      # address -> signatures, newest first
+        'transactions': {},    # signature -> jsonParsed getTransaction result
+        'token_accounts': {},  # owner -> [[token account, base64 data, token program], ...]
+        'accounts': {},        # address -> base64 data or None
+    }
+
+
+def _token_program(entry):
+    # Recordings made before Token-2022 accounts were fetched hold Token program accounts only
+    return entry[2] if len(entry) > 2 else TOKEN_PROGRAM_ID
+
+
+def load_recording(path):
+    with open(path) as f:
+        recording = json.load(f)
+    for key, value in _empty_recording().items():
+        recording.setdefault(key, value)
+    return recording
+
+
+class RecordingRpcClient:
+    """Wraps the shared RPC client and records every response for offline replay."""
+
+    def __init__(self, client, path=RPC_RECORD_PATH):
+        self.client = client
+        self.path = path
+        self.recording = load_recording(path) if os.path.exists(path) else _empty_recording()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    async def get_signatures_for_address(self, address, before=None, until=None, limit=None):
+        response = await self.client.get_signatures_for_address(address, before=before, until=until, limit=limit)
+        known = self.recording['signatures'].setdefault(str(address), [])
+        seen = set(known)
+        new = [str(info.signature) for info in response.value or [] if str(info.signature) not in seen]
+        if new:
+            # Pages arrive newest first; anything newer than what we had goes in front
+            if before is None:
+                known[:0] = new
+            else:
+                known.extend(new)
+        return response
+
+    async def get_transaction_json(self, signature):
+        result = await self.client.get_transaction_json(signature)
+        self.recording['transactions'][str(signature)] = result
+        return result
+
+    async def get_token_accounts_by_owner(self, owner, program_id):
+        response = await self.client.get_token_accounts_by_owner(owner, program_id)
+        # The owner's accounts of the other token program stay as recorded
+        accounts = [
+            entry for entry in self.recording['token_accounts'].get(str(owner), [])
+            if _token_program(entry) != str(program_id)
+        ]
+        accounts.extend(
+            [str(account.pubkey), base64.b64encode(bytes(account.account.data)).decode(), str(program_id)]
+            for account in response.value or []
+        )
+        self.recording['token_accounts'][str(owner)] = accounts
+        return response
+
+    async def get_account_info(self, pubkey):
+        response = await self.client.get_account_info(pubkey)
+        data = response.value.data if response.value else None
+        self.recording['accounts'][str(pubkey)] = base64.b64encode(bytes(data)).decode() if data is not None else None
+        return response
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.recording, f)
+        os.replace(tmp_path, self.path)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        self.save()
+        await self.client.close()
+
+
+def recording(client):
+    """Wrap `client` in a RecordingRpcClient when RPC_RECORD_PATH is set."""
+    if RPC_RECORD_PATH:
+        print(f"Recording RPC responses to {RPC_RECORD_PATH}")
+        return RecordingRpcClient(client, RPC_RECORD_PATH)
+    return client
+
+
+class ReplayRpcClient:
+    """Serves a recording in place of the shared RPC client, with optional simulated latency."""
+
+    def __init__(self, recording, latency_ms=0):
+        self.recording = recording
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    async def _rpc(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_signatures_for_address(self, address, before=None, until=None, limit=None):
+        await self._rpc()
+        signatures = self.recording['signatures'].get(str(address), [])
+        start = signatures.index(str(before)) + 1 if before is not None and str(before) in signatures else 0
+        page = []
+        for signature in signatures[start:]:
+            if until is not None and signature == str(until):
+                break
+            page.append(SignatureInfo(signature, None, None, None))
+            if limit is not None and len(page) >= limit:
+                break
+        return RpcResponse(page)
+
+    async def get_transaction_json(self, signature):
+        await self._rpc()
+        return self.recording['transactions'].get(str(signature))
+
+    async def get_token_accounts_by_owner(self, owner, program_id):
+        await self._rpc()
+        accounts = self.recording['token_accounts'].get(str(owner), [])
+        return RpcResponse([
+            KeyedAccount(entry[0], AccountData(base64.b64decode(entry[1])))
+            for entry in accounts if _token_program(entry) == str(program_id)
+        ])
+
+    async def get_account_info(self, pubkey):
+        await self._rpc()
+        data = self.recording['accounts'].get(str(pubkey))
+        return RpcResponse(AccountData(base64.b64decode(data)) if data is not None else None)
+
+    async def close(self):
+        pass
+
+
+class FakeBot:
+    """Telegram Bot stand-in that keeps sent messages instead of sending them."""
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000
+        self.messages = []
+
+    async def send_message(self, chat_id, text, parse_mode=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.messages.append((time.monotonic(), chat_id, text))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
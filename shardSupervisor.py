@@ -0,0 +1,259 @@
+import os
+import sys
+import time
+import bisect
+import signal
+import asyncio
+import hashlib
+import importlib
+import multiprocessing
+import multiprocessing.connection
+from dotenv import load_dotenv
+
+# Load environment variables from .env file; the modules below read their settings on import
+load_dotenv()
+
+from logSetup import get_logger
+
+# Runs a wallet bot across several processes so decoding is not capped at one core:
+#
+#   python shardSupervisor.py walletTradeAlert
+#   python shardSupervisor.py walletTransferAlertTest
+#
+# Watched wallets are consistent-hashed over SHARD_WORKERS worker processes, each
+# with its own event loop and RPC client. Alerts from every worker go to a single
+# delivery process that owns the Telegram bot and its rate limits. Cursors live
+# in the shared StateStore keyed by bot and address, so a wallet that moves to
+# another worker when SHARD_WORKERS changes resumes where it left off.
+
+# Worker processes; defaults to one per CPU core
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', str(os.cpu_count() or 1)))
+
+# Restart delay for a crashed process, doubled per crash in a row up to the maximum
+SHARD_RESTART_BACKOFF_SECONDS = float(os.getenv('SHARD_RESTART_BACKOFF_SECONDS', '1'))
+SHARD_RESTART_MAX_SECONDS = float(os.getenv('SHARD_RESTART_MAX_SECONDS', '60'))
+
+# A process that ran this long before exiting starts over from the base restart delay
+SHARD_STABLE_SECONDS = 60
+
+# Points per worker on the hash ring; more points spread wallets more evenly
+SHARD_VIRTUAL_NODES = 128
+
+# Seconds a stopping process gets to flush its state before it is killed
+SHARD_STOP_TIMEOUT_SECONDS = 15
+
+SHARDABLE_SCRIPTS = ('walletTradeAlert', 'walletTransferAlertTest')
+
+DELIVERY = 'delivery'
+
+logger = get_logger('shardSupervisor')
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent-hash ring over shard ids.
+
+    Adding or removing a shard only moves the wallets that hash next to its
+    points, about 1/N of them, instead of reshuffling the whole watch list.
+    """
+
+    def __init__(self, shards, replicas=SHARD_VIRTUAL_NODES):
+        points = sorted((_hash(f"shard-{shard}#{replica}"), shard) for shard in shards for replica in range(replicas))
+        if not points:
+            raise ValueError("A hash ring needs at least one shard")
+        self.hashes = [point for point, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    def owner(self, key):
+        return self.shards[bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)]
+
+
+class AlertForwarder:
+    """Stands in for the Telegram bot inside a worker: alerts go to the delivery process."""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    async def send_message(self, **kwargs):
+        # multiprocessing queues hand the pickling and pipe write to a feeder thread
+        self.queue.put(kwargs)
+
+
+def _metrics_port(offset):
+    # The delivery process serves on METRICS_PORT and worker N on METRICS_PORT + 1 + N
+    from metrics import METRICS_PORT
+    return METRICS_PORT + offset if METRICS_PORT else 0
+
+
+def _child_setup(metrics_port):
+    # Shutdown is coordinated by the supervisor, not by a terminal Ctrl+C reaching every process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.environ['METRICS_PORT'] = str(metrics_port)
+
+
+async def _work(module, shard, entries, alerts):
+    from rpcPool import SOLANA_RPC_URL
+    from httpPool import close_session
+    from rpcClient import SharedRpcClient
+    from stateStore import StateStore
+    from tokenMetadata import warm_token_index
+    from walletWatcher import WatchedWallet, run_wallet_watcher
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    wallets = [WatchedWallet(address, nickname) for address, nickname in entries]
+    logger.info("Worker started", extra={'shard': shard, 'wallets': len(wallets), 'pid': os.getpid()})
+    warm_token_index()
+    store = StateStore(module.STATE_NAMESPACE)
+    try:
+        async with SharedRpcClient(SOLANA_RPC_URL) as client:
+            await run_wallet_watcher(module.monitor_wallet, wallets, client, AlertForwarder(alerts), store=store)
+    finally:
+        store.close()
+        await close_session()
+
+
+def _run_worker(script, shard, entries, alerts, metrics_port):
+    _child_setup(metrics_port)
+    module = importlib.import_module(script)
+    try:
+        asyncio.run(_work(module, shard, entries, alerts))
+    except asyncio.CancelledError:
+        pass
+
+
+async def _deliver(module, alerts):
+    from alertQueue import AlertQueue, LazyTelegramBot
+    from metrics import start_metrics_server
+
+    loop = asyncio.get_running_loop()
+    metrics_server = await start_metrics_server()
+    try:
+        async with LazyTelegramBot(module.TELEGRAM_BOT_TOKEN) as bot, AlertQueue(bot) as outbound:
+            bot.warm()
+            for detector in module.pipeline.detectors:
+                await detector.send_keep_alive_message(outbound)
+            while True:
+                message = await loop.run_in_executor(None, alerts.get)
+                if message is None:
+                    break  # The supervisor is shutting down; AlertQueue drains on exit
+                await outbound.send_message(**message)
+    finally:
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+
+
+def _run_delivery(script, alerts, metrics_port):
+    _child_setup(metrics_port)
+    module = importlib.import_module(script)
+    asyncio.run(_deliver(module, alerts))
+
+
+class ShardSupervisor:
+    """Starts the delivery process and one worker per shard, and restarts any that exit."""
+
+    def __init__(self, script, wallets, workers=SHARD_WORKERS):
+        # spawn, not fork: children must not inherit the parent's event loop or HTTP sessions
+        self.context = multiprocessing.get_context('spawn')
+        self.alerts = self.context.Queue()
+        self.script = script
+        ring = HashRing(range(max(workers, 1)))
+        assignments = {}
+        for wallet in wallets:
+            assignments.setdefault(ring.owner(wallet.address), []).append((wallet.address, wallet.nickname))
+
+        # name -> (target, args); shards that own no wallet get no process
+        self.specs = {DELIVERY: (_run_delivery, (script, self.alerts, _metrics_port(0)))}
+        for shard, entries in sorted(assignments.items()):
+            self.specs[f"shard-{shard}"] = (_run_worker, (script, shard, entries, self.alerts, _metrics_port(1 + shard)))
+            logger.info("Assigned wallets", extra={'shard': shard, 'wallets': len(entries)})
+
+        self.processes = {}
+        self.started_at = {}
+        self.restart_delay = {}
+        self.restart_at = {}
+        self.stopping = False
+
+    def _start(self, name):
+        target, args = self.specs[name]
+        process = self.context.Process(target=target, args=args, name=name)
+        process.start()
+        self.processes[name] = process
+        self.started_at[name] = time.monotonic()
+
+    def _reap(self, name):
+        process = self.processes.pop(name)
+        process.join()
+        ran = time.monotonic() - self.started_at[name]
+        if ran >= SHARD_STABLE_SECONDS:
+            delay = SHARD_RESTART_BACKOFF_SECONDS
+        else:
+            delay = min(self.restart_delay.get(name, SHARD_RESTART_BACKOFF_SECONDS / 2) * 2, SHARD_RESTART_MAX_SECONDS)
+        self.restart_delay[name] = delay
+        self.restart_at[name] = time.monotonic() + delay
+        logger.warning("Process exited, restarting", extra={
+            'child': name, 'exitcode': process.exitcode, 'ran': round(ran, 1), 'restart_in': delay,
+        })
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        for name in self.specs:
+            self._start(name)
+        try:
+            while not self.stopping:
+                sentinels = {process.sentinel: name for name, process in self.processes.items()}
+                timeout = 1.0
+                if self.restart_at:
+                    timeout = min(timeout, max(min(self.restart_at.values()) - time.monotonic(), 0))
+                for sentinel in multiprocessing.connection.wait(list(sentinels), timeout):
+                    self._reap(sentinels[sentinel])
+                now = time.monotonic()
+                for name, due in list(self.restart_at.items()):
+                    if due <= now and not self.stopping:
+                        del self.restart_at[name]
+                        self._start(name)
+        finally:
+            self.stop()
+
+    def stop(self):
+        # Workers first, so their last alerts are queued before delivery is told to finish
+        workers = [process for name, process in self.processes.items() if name != DELIVERY]
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join(SHARD_STOP_TIMEOUT_SECONDS)
+            if process.is_alive():
+                process.kill()
+        delivery = self.processes.get(DELIVERY)
+        if delivery is not None:
+            self.alerts.put(None)
+            delivery.join(SHARD_STOP_TIMEOUT_SECONDS)
+            if delivery.is_alive():
+                delivery.kill()
+        self.processes = {}
+        logger.info("Supervisor stopped")
+
+
+def main():
+    script = sys.argv[1] if len(sys.argv) > 1 else 'walletTradeAlert'
+    if script not in SHARDABLE_SCRIPTS:
+        print(f"Usage: python shardSupervisor.py [{' | '.join(SHARDABLE_SCRIPTS)}]")
+        exit(1)
+
+    from walletWatcher import load_watched_wallets
+    wallets = load_watched_wallets()
+    if not wallets:
+        print("No wallet address provided in the .env file.")
+        exit(1)
+    print(f"Sharding {len(wallets)} wallets of {script} across {SHARD_WORKERS} worker processes...")
+    ShardSupervisor(script, wallets).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import time
+from logSetup import get_logger
+
+# Taken when an entry point imports this module, before its heavier imports
+PROCESS_START = time.perf_counter()
+
+logger = get_logger(__name__)
+
+
+class StartupTimer:
+    """Wall-clock time of each startup phase, from process start to the first completed poll.
+
+    `mark(phase)` ends a phase that began at the previous mark; `done(phase)`
+    ends the last one and reports the breakdown once, as a log line and as
+    the startup_seconds gauge. Later calls are no-ops, so the hot path can
+    call `done` unconditionally.
+    """
+
+    def __init__(self, start=PROCESS_START):
+        self.start = start
+        self.last = start
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase):
+        if self.reported:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def done(self, phase):
+        if self.reported:
+            return
+        self.mark(phase)
+        self.reported = True
+        from metrics import STARTUP_SECONDS
+        total = self.last - self.start
+        for name, seconds in self.phases:
+            STARTUP_SECONDS.set(round(seconds, 4), name)
+        STARTUP_SECONDS.set(round(total, 4), 'total')
+        fields = {name: f"{seconds:.3f}s" for name, seconds in self.phases}
+        logger.info("Startup complete", extra={'total': f"{total:.3f}s", **fields})
+
+
+# The process-wide timer the entry points and the watcher share
+startup = StartupTimer()
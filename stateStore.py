@@ -0,0 +1,151 @@
+import os
+import time
+import sqlite3
+import asyncio
+from collections import OrderedDict
+from logSetup import get_logger
+
+# SQLite file holding per-address cursors and recently processed signatures
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'botState.sqlite3')
+
+# How long a processed signature is remembered for deduplication
+DEDUP_WINDOW_SECONDS = float(os.getenv('DEDUP_WINDOW_SECONDS', '86400'))
+
+# Hard cap on remembered signatures, on top of the time window
+DEDUP_MAX_ENTRIES = int(os.getenv('DEDUP_MAX_ENTRIES', '200000'))
+
+# Seconds between batched writes
+STATE_FLUSH_SECONDS = float(os.getenv('STATE_FLUSH_SECONDS', '1'))
+
+# How long a write waits for another process (a shard sharing the file) to release its lock
+STATE_DB_TIMEOUT_SECONDS = float(os.getenv('STATE_DB_TIMEOUT_SECONDS', '10'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cursors (
+    address TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen_signatures (
+    scope TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (scope, signature)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS seen_signatures_seen_at ON seen_signatures (seen_at);
+'''
+
+logger = get_logger(__name__)
+
+
+class StateStore:
+    """Per-address cursors and a time-windowed dedup set, persisted in SQLite (WAL mode).
+
+    Reads are served from memory; writes are buffered and flushed in one
+    transaction every STATE_FLUSH_SECONDS and on close. `namespace` keeps
+    bots that watch the same address from sharing a cursor.
+    """
+
+    def __init__(self, namespace, path=STATE_DB_PATH):
+        self.namespace = namespace
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=STATE_DB_TIMEOUT_SECONDS)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.cursors = dict(self.conn.execute('SELECT address, signature FROM cursors'))
+        cutoff = time.time() - DEDUP_WINDOW_SECONDS
+        # (scope, signature) -> seen_at, oldest first
+        self.seen = OrderedDict(
+            ((scope, signature), seen_at)
+            for scope, signature, seen_at in self.conn.execute(
+                'SELECT scope, signature, seen_at FROM seen_signatures WHERE seen_at >= ? ORDER BY seen_at',
+                (cutoff,),
+            )
+        )
+        self.pending_cursors = {}
+        self.pending_seen = []
+        self.flush_task = None
+
+    def _key(self, address):
+        return f"{self.namespace}:{address}"
+
+    def get_cursor(self, address):
+        return self.cursors.get(self._key(address))
+
+    def set_cursor(self, address, signature):
+        signature = str(signature)
+        self.cursors[self._key(address)] = signature
+        self.pending_cursors[self._key(address)] = signature
+
+    def is_seen(self, scope, signature):
+        return (self._key(scope), str(signature)) in self.seen
+
+    def mark_seen(self, scope, signature):
+        key = (self._key(scope), str(signature))
+        if key in self.seen:
+            return
+        now = time.time()
+        self.seen[key] = now
+        self.pending_seen.append((key[0], key[1], now))
+        self._prune(now)
+
+    def _prune(self, now):
+        cutoff = now - DEDUP_WINDOW_SECONDS
+        while self.seen:
+            key, seen_at = next(iter(self.seen.items()))
+            if seen_at >= cutoff and len(self.seen) <= DEDUP_MAX_ENTRIES:
+                break
+            self.seen.popitem(last=False)
+
+    def flush(self):
+        if not self.pending_cursors and not self.pending_seen:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO cursors (address, signature, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(address) DO UPDATE SET signature = excluded.signature, updated_at = excluded.updated_at',
+                [(address, signature, now) for address, signature in self.pending_cursors.items()],
+            )
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO seen_signatures (scope, signature, seen_at) VALUES (?, ?, ?)',
+                self.pending_seen,
+            )
+            self.conn.execute('DELETE FROM seen_signatures WHERE seen_at < ?', (now - DEDUP_WINDOW_SECONDS,))
+            # The same cap as in memory: all but the newest DEDUP_MAX_ENTRIES go
+            self.conn.execute(
+                'DELETE FROM seen_signatures WHERE seen_at < '
+                '(SELECT seen_at FROM seen_signatures ORDER BY seen_at DESC LIMIT 1 OFFSET ?)',
+                (DEDUP_MAX_ENTRIES - 1,),
+            )
+        self.pending_cursors = {}
+        self.pending_seen = []
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(STATE_FLUSH_SECONDS)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning("Error writing bot state; retrying on the next flush", extra={
+                    'path': self.path, 'cursors': len(self.pending_cursors), 'signatures': len(self.pending_seen),
+                    'error': e,
+                })
+
+    def start(self):
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self._flush_periodically())
+
+    def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.error("Bot state lost on shutdown", extra={
+                'path': self.path, 'cursors': len(self.pending_cursors), 'signatures': len(self.pending_seen),
+                'error': e,
+            })
+        self.conn.close()
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import base64
+import asyncio
+from solders.pubkey import Pubkey
+from logSetup import get_logger
+from tokenTransfers import TOKEN_PROGRAM_ID, TOKEN_2022_PROGRAM_ID
+
+# Full get_token_accounts_by_owner refresh interval, as a safety net for missed updates
+TOKEN_ACCOUNT_REFRESH_SECONDS = float(os.getenv('TOKEN_ACCOUNT_REFRESH_SECONDS', '900'))
+
+INITIALIZE_ACCOUNT_TYPES = {'initializeAccount', 'initializeAccount2', 'initializeAccount3'}
+
+logger = get_logger(__name__)
+
+
+def _account_data(account):
+    data = account.data
+    if isinstance(data, (list, tuple)):
+        return base64.b64decode(data[0])
+    return bytes(data)
+
+
+def _parsed_instructions(txn):
+    for instr in txn.instructions:
+        yield instr
+    for inner in txn.inner_instructions:
+        yield from inner.get('instructions', [])
+
+
+class TokenAccountCache:
+    """Token account -> mint map for one wallet.
+
+    Updated incrementally from every processed transaction (token balances,
+    InitializeAccount, CloseAccount, owner changes) and fully refreshed from
+    getTokenAccountsByOwner, for both the Token and the Token-2022 program,
+    every TOKEN_ACCOUNT_REFRESH_SECONDS.
+    Mint addresses are interned, so wallets holding the same token share
+    one string for it.
+    """
+
+    __slots__ = ('wallet', 'accounts', 'refreshed_at')
+
+    def __init__(self, wallet):
+        self.wallet = wallet
+        self.accounts = {}
+        self.refreshed_at = None
+
+    def is_stale(self):
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at >= TOKEN_ACCOUNT_REFRESH_SECONDS
+
+    async def refresh(self, client):
+        responses = await asyncio.gather(*(
+            client.get_token_accounts_by_owner(self.wallet.pubkey, program_id)
+            for program_id in (TOKEN_PROGRAM_ID, TOKEN_2022_PROGRAM_ID)
+        ))
+        accounts = {}
+        for response in responses:
+            for account_info in response.value or []:
+                data = _account_data(account_info.account)
+                # The mint is the first 32 bytes of the token account layout, in both programs
+                if len(data) >= 64:
+                    accounts[str(account_info.pubkey)] = sys.intern(str(Pubkey.from_bytes(data[0:32])))
+        self.accounts = accounts
+        self.refreshed_at = time.monotonic()
+        logger.debug("Refreshed token accounts", extra={'wallet': self.wallet.address, 'accounts': len(accounts)})
+
+    def apply_transaction(self, txn):
+        """Fold one transaction into the cache.
+
+        Returns every token account the wallet owned at any point during the
+        transaction, so transfers out of an account closed in the same
+        transaction are still attributed to the wallet.
+        """
+        owner = self.wallet.address
+        account_keys = txn.account_keys
+        meta = txn.meta or {}
+        owned = dict(self.accounts)
+        closed = set()
+
+        for balance in meta.get('preTokenBalances') or []:
+            idx = balance.get('accountIndex')
+            if balance.get('owner') == owner and idx is not None and idx < len(account_keys):
+                owned[account_keys[idx]] = balance.get('mint')
+
+        for instr in _parsed_instructions(txn):
+            parsed = instr.get('parsed')
+            if not isinstance(parsed, dict):
+                continue
+            kind = parsed.get('type')
+            info = parsed.get('info') or {}
+            account = info.get('account')
+            if kind in INITIALIZE_ACCOUNT_TYPES and info.get('owner') == owner:
+                owned[account] = info.get('mint')
+                closed.discard(account)
+            elif kind == 'closeAccount' and account in owned:
+                closed.add(account)
+            elif kind == 'setAuthority' and info.get('authorityType') == 'accountOwner' and account in owned:
+                if info.get('newAuthority') != owner:
+                    closed.add(account)
+
+        live = {}
+        for balance in meta.get('postTokenBalances') or []:
+            idx = balance.get('accountIndex')
+            if idx is not None and idx < len(account_keys):
+                live[account_keys[idx]] = balance
+
+        for account, balance in live.items():
+            if balance.get('owner') == owner:
+                owned[account] = balance.get('mint')
+                closed.discard(account)
+            elif account in owned:
+                closed.add(account)
+
+        self.accounts = {
+            account: sys.intern(mint) if mint else mint for account, mint in owned.items() if account not in closed
+        }
+        return owned
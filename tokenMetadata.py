@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import tempfile
+import asyncio
+from collections import namedtuple
+from solders.pubkey import Pubkey
+from httpPool import get_session
+from logSetup import get_logger
+from ttlCache import TtlLruCache
+from txnParser import loads
+
+TOKEN_LIST_URL = 'https://raw.githubusercontent.com/solana-labs/token-list/main/src/tokens/solana.tokenlist.json'
+
+# Where the mint index is persisted between restarts
+TOKEN_CACHE_DIR = os.getenv('TOKEN_CACHE_DIR', '.cache')
+TOKEN_INDEX_PATH = os.path.join(TOKEN_CACHE_DIR, 'tokenIndex.json')
+
+# On-chain decimals for mints missing from the token list
+MINT_DECIMALS_CACHE_SIZE = int(os.getenv('MINT_DECIMALS_CACHE_SIZE', '4096'))
+MINT_DECIMALS_TTL_SECONDS = float(os.getenv('MINT_DECIMALS_TTL_SECONDS', '3600'))
+
+# Offset of the decimals byte in the SPL mint layout (same for Token-2022)
+MINT_DECIMALS_OFFSET = 44
+
+TokenInfo = namedtuple('TokenInfo', ['symbol', 'name', 'decimals'])
+
+# Mint address -> TokenInfo
+token_index = None
+token_index_task = None
+mint_decimals_cache = TtlLruCache(MINT_DECIMALS_CACHE_SIZE, MINT_DECIMALS_TTL_SECONDS)
+
+logger = get_logger(__name__)
+
+
+def _build_index(tokens):
+    index = {}
+    for token in tokens:
+        address = token.get('address')
+        if address:
+            index[address] = TokenInfo(token.get('symbol'), token.get('name'), token.get('decimals'))
+    return index
+
+
+def _read_cached_index():
+    try:
+        with open(TOKEN_INDEX_PATH) as f:
+            cached = json.load(f)
+        cached['tokens'] = {mint: TokenInfo(*info) for mint, info in cached['tokens'].items()}
+        return cached
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning("Ignoring unreadable token index cache", extra={'path': TOKEN_INDEX_PATH, 'error': e})
+        return None
+
+
+def _write_cached_index(index, etag, last_modified):
+    os.makedirs(TOKEN_CACHE_DIR, exist_ok=True)
+    # A temp file per process, since shard workers sharing the cache directory refresh it at the same time
+    fd, tmp_path = tempfile.mkstemp(prefix='tokenIndex.', suffix='.tmp', dir=TOKEN_CACHE_DIR)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'etag': etag,
+                'last_modified': last_modified,
+                'tokens': {mint: list(info) for mint, info in index.items()},
+            }, f)
+        os.replace(tmp_path, TOKEN_INDEX_PATH)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+async def _fetch_token_index(session, cached):
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    try:
+        async with session.get(TOKEN_LIST_URL, headers=headers) as resp:
+            if resp.status == 304 and cached:
+                logger.info("Token list unchanged; using the cached copy", extra={'tokens': len(cached['tokens'])})
+                return cached['tokens']
+            if resp.status == 200:
+                data = loads(await resp.read())
+                index = _build_index(data.get('tokens', []))
+                try:
+                    _write_cached_index(index, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+                except OSError as e:
+                    # The download is still good; only the next start has to fetch it again
+                    logger.warning("Could not cache the token list", extra={'path': TOKEN_INDEX_PATH, 'error': e})
+                logger.info("Fetched token list", extra={'tokens': len(index)})
+                return index
+            logger.warning("Failed to fetch token list", extra={'status': resp.status})
+    except Exception as e:
+        logger.warning("Exception while fetching token list", extra={'error': e})
+
+    return cached['tokens'] if cached else {}
+
+
+async def _refresh_token_index(cached):
+    global token_index
+    start = time.perf_counter()
+    token_index = await _fetch_token_index(get_session(), cached)
+    logger.info("Token index ready", extra={
+        'tokens': len(token_index), 'seconds': round(time.perf_counter() - start, 2),
+    })
+
+
+def warm_token_index():
+    """Start loading the mint index in the background, once per process.
+
+    The on-disk copy from the last run is served right away while it is
+    revalidated with ETag/Last-Modified; only a first run without a cache
+    makes lookups wait for the download.
+    """
+    global token_index, token_index_task
+    if token_index is not None or token_index_task is not None:
+        return
+    cached = _read_cached_index()
+    if cached:
+        token_index = cached['tokens']
+    else:
+        logger.info("Loading token list")
+    token_index_task = asyncio.ensure_future(_refresh_token_index(cached))
+
+
+async def load_token_index():
+    """The mint index, waiting for the download only when there is no cached copy yet."""
+    if token_index is None:
+        warm_token_index()
+    if token_index is None:
+        # Shielded: a cancelled lookup must not cancel the shared download
+        await asyncio.shield(token_index_task)
+    return token_index
+
+
+async def get_token_name_from_mint(mint_address):
+    index = await load_token_index()
+    token = index.get(mint_address)
+    if token is None:
+        return None
+    return token.symbol or token.name or None
+
+
+async def get_token_decimals(mint_address, client):
+    """Decimals from the token list, falling back to the on-chain mint account."""
+    index = await load_token_index()
+    token = index.get(mint_address)
+    if token is not None and token.decimals is not None:
+        return token.decimals
+
+    hit, decimals = mint_decimals_cache.get(mint_address)
+    if hit:
+        return decimals
+
+    decimals = None
+    try:
+        response = await client.get_account_info(Pubkey.from_string(mint_address))
+        data = response.value.data if response.value else b''
+        if len(data) > MINT_DECIMALS_OFFSET:
+            decimals = data[MINT_DECIMALS_OFFSET]
+    except Exception as e:
+        logger.warning("Failed to fetch mint account", extra={'mint': mint_address, 'error': e})
+        return None
+    mint_decimals_cache.set(mint_address, decimals)
+    return decimals
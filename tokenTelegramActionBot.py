@@ -1,94 +1,127 @@
-from solana.rpc.async_api import AsyncClient
-from solders.pubkey import Pubkey
-from telegram import Bot
 import asyncio
 import os
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
+# Load environment variables from .env file; the modules below read their settings on import
 load_dotenv()
 
+from startupTimer import startup
+from solders.pubkey import Pubkey
+from activityDetector import ActivityDetector
+from alertPipeline import Detector, AlertPipeline, run_pipeline
+from balanceDeltas import compute_balance_deltas
+from dexDecoders import decode_swaps
+from logSetup import get_logger
+from metrics import STAGE_SECONDS
+from pricing import price_book, format_usd
+from walletWatcher import WatchedWallet
+
 # Telegram Bot API token and Chat ID from environment variables
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
 
-# Solana network setup
-SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
-TARGET_ADDRESS = Pubkey.from_string(os.getenv("TARGET_ADDRESS"))
-
-# Initialize Solana and Telegram clients
-solana_client = AsyncClient(SOLANA_RPC_URL)
-telegram_bot = Bot(token=TELEGRAM_TOKEN)
-
-async def get_recent_transactions(address):
-    # Fetch recent transactions for the target address
-    response = await solana_client.get_signatures_for_address(address, limit=1)
-    if response.value:
-        return response.value
-    return []
-
-async def get_transaction_details(signature):
-    # Fetch transaction details for a given signature
-    response = await solana_client.get_transaction(
-        signature,
-        max_supported_transaction_version=0
+# The token whose mint address is watched
+TARGET = WatchedWallet(os.getenv("TARGET_ADDRESS").strip(), "Target")
+TARGET_ADDRESS = TARGET.pubkey
+TOKEN_SYMBOL = os.getenv("TOKEN_SYMBOL", "BALLZ")
+
+# Cursor and processed signatures are kept under this name in the StateStore
+STATE_NAMESPACE = 'tokenTelegramActionBot'
+
+logger = get_logger('tokenTelegramActionBot')
+
+# Optional static price, only used until a swap or the price source has priced the token
+PRICE_PER_TOKEN_USD = float(os.getenv("PRICE_PER_TOKEN_USD")) if os.getenv("PRICE_PER_TOKEN_USD") else None
+
+# Sliding-window buy/sell aggregation; alerts only fire on threshold or z-score crossings
+activity_detector = ActivityDetector()
+
+def format_activity_alert(snapshot, price):
+    volume = snapshot.buy_volume + snapshot.sell_volume
+    z_line = f"\n📈 {snapshot.z_score:.1f}σ above recent activity" if snapshot.z_score is not None else ""
+    return (
+        f"🚨 Heavy ${TOKEN_SYMBOL} activity! 🚨\n\n"
+        f"Last {snapshot.window_seconds:.0f}s: {snapshot.buys} buys / {snapshot.sells} sells "
+        f"from {snapshot.unique_buyers} unique buyers\n"
+        f"Volume: {volume:,.2f} ${TOKEN_SYMBOL}{format_usd(volume, price)}"
+        f"{z_line}\n\n"
+        f"🔗 [View Token on Dexscreener](https://dexscreener.com/solana/{TARGET.address})"
     )
-    if response.value:
-        tx_details = response.value
-        return tx_details
-    return None
-
-async def check_transaction():
-    seen_signatures = set()
-    
-    while True:
-        try:
-            transactions = await get_recent_transactions(TARGET_ADDRESS)
-
-            if transactions:
-                for tx in transactions:
-                    signature = tx['signature']
-
-                    if signature not in seen_signatures:
-                        seen_signatures.add(signature)
-
-                        # Fetch transaction details
-                        tx_details = await get_transaction_details(signature)
-                        if tx_details:
-                            # Access the meta data as a dictionary
-                            meta = tx_details.get('meta', {})
-                            if meta:
-                                pre_balances = meta.get('preTokenBalances', [])
-                                post_balances = meta.get('postTokenBalances', [])
-
-                                # Calculate the amount purchased
-                                if pre_balances and post_balances:
-                                    pre_balance = int(pre_balances[0]['uiTokenAmount']['amount'])
-                                    post_balance = int(post_balances[0]['uiTokenAmount']['amount'])
-                                    decimals = pre_balances[0]['uiTokenAmount']['decimals']
-                                    amount_bought = (post_balance - pre_balance) / (10 ** decimals)
-
-                                    # Assuming a fixed price for $BALLZ
-                                    price_per_token_usd = float(os.getenv("PRICE_PER_TOKEN_USD", "1"))
-                                    total_usd = amount_bought * price_per_token_usd
-
-                                    # Post a message to Telegram
-                                    await telegram_bot.send_message(
-                                        chat_id=CHAT_ID,
-                                        text=f"Someone went BALLZ DEEP and bought {amount_bought:.2f} $BALLZ (${total_usd:.2f} equivalent)"
-                                    )
-
-        except Exception as e:
-            print(f"Error checking transactions: {e}")
-
-        # Wait before checking again
-        await asyncio.sleep(10)
 
-async def main():
+def _is_wallet(owner, signers):
+    # Pool vaults belong to program-derived (off-curve) authorities; traders hold keypair (on-curve) wallets
+    if owner in signers:
+        return True
     try:
-        await check_transaction()
-    finally:
-        await solana_client.close()  # Ensure the client is closed properly
+        return Pubkey.from_string(owner).is_on_curve()
+    except ValueError:
+        return False
+
+def target_trades(txn):
+    """(side, amount, trader) for every buy or sell of the target token in the transaction.
+
+    Swaps are decoded from the DEX instructions, routed ones included. When
+    no registered decoder finds one, as for a DEX not in DEX_DECODERS or a
+    swap made on behalf of a non-signing owner, the wallets' net balance
+    changes are used instead, provided a pool took the other side.
+    """
+    trades = []
+    for trade in decode_swaps(txn):
+        if trade.out_mint == TARGET.address:
+            trades.append(('buy', trade.out_amount / (10 ** trade.out_decimals), trade.trader))
+        elif trade.in_mint == TARGET.address:
+            trades.append(('sell', trade.in_amount / (10 ** trade.in_decimals), trade.trader))
+    if trades:
+        return trades
+
+    changes = [change for change in compute_balance_deltas(txn.meta, txn.account_keys)
+               if change.mint == TARGET.address and change.delta != 0]
+    wallets = [change for change in changes if _is_wallet(change.owner, txn.signers)]
+    if len(wallets) == len(changes):
+        return []  # Only wallets moved the token: a transfer, not a swap
+    return [
+        ('buy' if change.delta > 0 else 'sell', abs(change.delta) / (10 ** change.decimals), change.owner)
+        for change in wallets
+    ]
+
+class TokenActivityDetector(Detector):
+    """Heavy buy/sell activity in the target token, from every swap that touches its mint."""
+
+    name = 'token'
+    namespace = STATE_NAMESPACE
+    telegram_token = TELEGRAM_TOKEN
+    chat_id = CHAT_ID
+    poll_interval = 10
+    keep_alive_message = None
+
+    def watch(self):
+        return [TARGET]
+
+    async def detect(self, wallet, signature, txn, client, bot):
+        if txn.meta.get('err') is not None:
+            return
+
+        with STAGE_SECONDS.time('classify'):
+            trades = target_trades(txn)
+
+        for side, amount, trader in trades:
+            # Feed the sliding window; only threshold crossings are posted
+            snapshot = activity_detector.record(TARGET.address, side, amount, trader, txn.block_time)
+            if snapshot is not None:
+                price = await price_book.get_usd_price(TARGET.address)
+                if price is None:
+                    price = PRICE_PER_TOKEN_USD
+                await bot.send_message(chat_id=CHAT_ID, text=format_activity_alert(snapshot, price), parse_mode='Markdown')
+
+# Run on its own, the bot is the shared pipeline with just this detector (see alertBot.py to combine them)
+token_activity_detector = TokenActivityDetector()
+pipeline = AlertPipeline([token_activity_detector])
+check_transaction = pipeline.monitor
+
+async def main():
+    startup.mark('imports')
+    # Stream log notifications when SOLANA_WS_URL is set, otherwise poll every 10 seconds
+    await run_pipeline([token_activity_detector], STATE_NAMESPACE)
 
 # Run the bot
 if __name__ == "__main__":
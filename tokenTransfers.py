@@ -0,0 +1,180 @@
+import struct
+from collections import namedtuple
+from base58Codec import b58decode
+
+TOKEN_PROGRAM_ID = 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA'
+TOKEN_2022_PROGRAM_ID = 'TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb'
+TOKEN_PROGRAM_IDS = {TOKEN_PROGRAM_ID, TOKEN_2022_PROGRAM_ID}
+
+# One token movement. `kind` is 'transfer', 'mint' or 'burn'; a mint has no
+# source and a burn no destination. Source and destination are token accounts.
+# `amount` is in raw units and is what left the source (Token-2022 transfer
+# fees are withheld from it on arrival). `decimals` is None when neither the
+# instruction nor the transaction's token balances say.
+TokenTransfer = namedtuple('TokenTransfer', [
+    'kind', 'program_id', 'mint', 'source', 'destination', 'authority', 'amount', 'decimals',
+])
+
+# Instruction tag -> (kind, account positions of source, mint, destination, authority, has decimals).
+# Unchecked transfers do not name the mint; it comes from the token balances.
+_RAW_LAYOUTS = {
+    3: ('transfer', 0, None, 1, 2, False),   # Transfer
+    7: ('mint', None, 0, 1, 2, False),       # MintTo
+    8: ('burn', 0, 1, None, 2, False),       # Burn
+    12: ('transfer', 0, 1, 2, 3, True),      # TransferChecked
+    14: ('mint', None, 0, 1, 2, True),       # MintToChecked
+    15: ('burn', 0, 1, None, 2, True),       # BurnChecked
+}
+
+# Token-2022 TransferFeeExtension instruction and its TransferCheckedWithFee sub-instruction
+_TRANSFER_FEE_EXTENSION = 26
+_TRANSFER_CHECKED_WITH_FEE = 1
+
+# jsonParsed instruction type -> kind
+_PARSED_KINDS = {
+    'transfer': 'transfer',
+    'transferChecked': 'transfer',
+    'transferCheckedWithFee': 'transfer',
+    'mintTo': 'mint',
+    'mintToChecked': 'mint',
+    'burn': 'burn',
+    'burnChecked': 'burn',
+}
+
+_U64 = struct.Struct('<Q')
+_U64_U8 = struct.Struct('<QB')
+
+
+class _TransferDecoder:
+    """Per-transaction lookup tables, built once and shared by every instruction."""
+
+    __slots__ = ('account_keys', 'token_accounts', 'token_program_indices')
+
+    def __init__(self, txn):
+        self.account_keys = txn.account_keys
+        # token account -> (mint, decimals), from the balance entries
+        self.token_accounts = {}
+        key_count = len(self.account_keys)
+        meta = txn.meta or {}
+        for entries in (meta.get('preTokenBalances') or (), meta.get('postTokenBalances') or ()):
+            for balance in entries:
+                idx = balance.get('accountIndex')
+                if idx is None or idx >= key_count:
+                    continue
+                decimals = (balance.get('uiTokenAmount') or {}).get('decimals')
+                self.token_accounts[self.account_keys[idx]] = (balance.get('mint'), decimals)
+        # Account indices of the token programs, for instructions compiled to indices ('json' encoding)
+        self.token_program_indices = {
+            idx for idx, key in enumerate(self.account_keys) if key in TOKEN_PROGRAM_IDS
+        }
+
+    def _transfer(self, kind, program_id, mint, source, destination, authority, amount, decimals):
+        if mint is None or decimals is None:
+            known = self.token_accounts.get(source) or self.token_accounts.get(destination)
+            if known is not None:
+                mint = mint or known[0]
+                decimals = known[1] if decimals is None else decimals
+        return TokenTransfer(kind, program_id, mint, source, destination, authority, amount, decimals)
+
+    def decode_parsed(self, instruction, parsed):
+        kind = _PARSED_KINDS.get(parsed.get('type'))
+        if kind is None:
+            return None
+        info = parsed.get('info') or {}
+        amount = info.get('amount')
+        decimals = None
+        if amount is None:
+            token_amount = info.get('tokenAmount') or {}
+            amount = token_amount.get('amount', 0)
+            decimals = token_amount.get('decimals')
+        if kind == 'mint':
+            source, destination = None, info.get('account')
+            authority = info.get('mintAuthority') or info.get('multisigMintAuthority')
+        elif kind == 'burn':
+            source, destination = info.get('account'), None
+            authority = info.get('authority') or info.get('multisigAuthority')
+        else:
+            source, destination = info.get('source'), info.get('destination')
+            authority = info.get('authority') or info.get('multisigAuthority')
+        return self._transfer(kind, instruction.get('programId'), info.get('mint'), source, destination,
+                              authority, int(amount), decimals)
+
+    def decode_raw(self, program_id, accounts, data):
+        data = b58decode(data)
+        if not data:
+            return None
+        tag = data[0]
+        offset = 1
+        if tag == _TRANSFER_FEE_EXTENSION:
+            if len(data) < 2 or data[1] != _TRANSFER_CHECKED_WITH_FEE:
+                return None
+            layout = _RAW_LAYOUTS[12]
+            offset = 2
+        else:
+            layout = _RAW_LAYOUTS.get(tag)
+            if layout is None:
+                return None
+        kind, source_at, mint_at, destination_at, authority_at, checked = layout
+        if len(accounts) <= authority_at or len(data) < offset + (9 if checked else 8):
+            return None
+        if checked:
+            amount, decimals = _U64_U8.unpack_from(data, offset)
+        else:
+            amount, decimals = _U64.unpack_from(data, offset)[0], None
+        keys = self.account_keys
+        if accounts and isinstance(accounts[0], int):
+            # 'json' encoding: accounts are indices into the account keys
+            accounts = [keys[idx] for idx in accounts]
+        return self._transfer(
+            kind, program_id,
+            accounts[mint_at] if mint_at is not None else None,
+            accounts[source_at] if source_at is not None else None,
+            accounts[destination_at] if destination_at is not None else None,
+            accounts[authority_at], amount, decimals,
+        )
+
+    def decode(self, instruction):
+        parsed = instruction.get('parsed')
+        if parsed is not None:
+            if isinstance(parsed, dict) and instruction.get('programId') in TOKEN_PROGRAM_IDS:
+                return self.decode_parsed(instruction, parsed)
+            return None
+        program_id = instruction.get('programId')
+        if program_id is None:
+            idx = instruction.get('programIdIndex')
+            if idx not in self.token_program_indices:
+                return None
+            program_id = self.account_keys[idx]
+        elif program_id not in TOKEN_PROGRAM_IDS:
+            return None
+        data = instruction.get('data')
+        if not data:
+            return None
+        return self.decode_raw(program_id, instruction.get('accounts') or (), data)
+
+
+def decode_token_transfers(txn):
+    """Every Token and Token-2022 transfer, mint and burn in the transaction, in execution order.
+
+    Inner instructions are included, so transfers made by CPI from a DEX or
+    router are reported alongside top-level ones. Reads the jsonParsed form
+    the RPC returns for token instructions, and raw instruction bytes (base58
+    data, with accounts as pubkeys or as indices under 'json' encoding) for
+    anything left unparsed. Failed transactions moved nothing and give [].
+    """
+    if txn is None or not txn.meta or txn.meta.get('err') is not None:
+        return []
+    decoder = None
+    inner_by_index = {group.get('index'): group.get('instructions') or () for group in txn.inner_instructions}
+    transfers = []
+    for index, instruction in enumerate(txn.instructions):
+        for instr in (instruction, *inner_by_index.get(index, ())):
+            program_id = instr.get('programId')
+            if program_id is not None and program_id not in TOKEN_PROGRAM_IDS:
+                continue
+            if decoder is None:
+                decoder = _TransferDecoder(txn)
+            transfer = decoder.decode(instr)
+            if transfer is not None:
+                transfers.append(transfer)
+    return transfers
@@ -0,0 +1,202 @@
+import os
+import time
+import asyncio
+from collections import deque
+from httpPool import connection_reuse_summary
+from logSetup import get_logger
+from metrics import RPC_ERRORS
+from rpcPool import RpcPool, RpcError, RpcHttpError, RpcUnavailable
+from txnParser import loads
+
+# Signatures grouped into one JSON-RPC batch request
+FETCH_BATCH_SIZE = int(os.getenv('FETCH_BATCH_SIZE', '50'))
+
+# How long a signature waits for others to join its batch
+FETCH_BATCH_WINDOW_MS = float(os.getenv('FETCH_BATCH_WINDOW_MS', '20'))
+
+# Batches (or single calls, when batching is rejected) in flight at once
+FETCH_MAX_INFLIGHT = int(os.getenv('FETCH_MAX_INFLIGHT', '4'))
+
+# Seconds between fetch latency/throughput reports
+FETCH_REPORT_SECONDS = float(os.getenv('FETCH_REPORT_SECONDS', '60'))
+
+# HTTP statuses providers answer with when they do not accept batch requests
+BATCH_REJECTED_STATUSES = {400, 403, 405, 413}
+
+# JSON-RPC error code for a request the server cannot take, which is how some providers answer a batch
+BATCH_REJECTED_ERROR_CODES = {-32600}
+
+logger = get_logger(__name__)
+
+
+class BatchRejected(Exception):
+    pass
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class TransactionFetcher:
+    """Groups getTransaction calls from every watched wallet into JSON-RPC batch requests.
+
+    Falls back to bounded-concurrency single calls when the provider rejects
+    batches, and periodically reports the latency and throughput it achieves.
+    """
+
+    def __init__(self, pool=None, batch_size=FETCH_BATCH_SIZE,
+                 batch_window_ms=FETCH_BATCH_WINDOW_MS, max_inflight=FETCH_MAX_INFLIGHT):
+        self.pool = pool if pool is not None else RpcPool()
+        self.batch_size = batch_size
+        self.batch_window = batch_window_ms / 1000
+        self.slots = asyncio.Semaphore(max_inflight)
+        self.batch_supported = True
+        self.pending = []
+        self.flush_handle = None
+        # Batch sends in flight, so close() can wait for them
+        self.send_tasks = set()
+        self.request_id = 0
+        # Per-transaction latency from request to result, in seconds
+        self.latencies = deque(maxlen=4096)
+        self.fetched = 0
+        self.batches = 0
+        self.window_started = time.monotonic()
+        self.window_fetched = 0
+
+    async def get_transaction(self, signature):
+        """Return the jsonParsed getTransaction result for `signature` as a dict, or None."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((str(signature), future, time.monotonic()))
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self.send_tasks.add(task)
+            task.add_done_callback(self.send_tasks.discard)
+
+    def _request(self, signature):
+        self.request_id += 1
+        return {
+            'jsonrpc': '2.0',
+            'id': self.request_id,
+            'method': 'getTransaction',
+            'params': [signature, {'encoding': 'jsonParsed', 'maxSupportedTransactionVersion': 0}],
+        }
+
+    async def _post(self, payload):
+        # Slow lookups are hedged to a second endpoint when several are configured
+        try:
+            return loads(await self.pool.post(payload, 'getTransaction', hedge=True))
+        except RpcHttpError as e:
+            if isinstance(payload, list) and e.status in BATCH_REJECTED_STATUSES:
+                raise BatchRejected(f"HTTP {e.status}")
+            raise
+
+    async def _send(self, batch):
+        try:
+            if self.batch_supported and len(batch) > 1:
+                try:
+                    await self._send_batch(batch)
+                    return
+                except BatchRejected as e:
+                    logger.warning("RPC provider rejected batch requests; falling back to parallel single calls",
+                                   extra={'reason': e})
+                    self.batch_supported = False
+            await asyncio.gather(*(self._send_single(item) for item in batch))
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    RPC_ERRORS.inc('getTransaction')
+                    future.set_exception(e)
+
+    async def _send_batch(self, batch):
+        requests = [self._request(signature) for signature, _, _ in batch]
+        async with self.slots:
+            responses = await self._post(requests)
+        if not isinstance(responses, list):
+            error = responses.get('error') or {}
+            message = str(error.get('message', 'non-batch response'))
+            if error.get('code') in BATCH_REJECTED_ERROR_CODES or 'batch' in message.lower():
+                raise BatchRejected(message)
+            # Any other error (rate limit, node overloaded) is about the request as a whole, not a
+            # transaction in it; batching stays on and the transactions are retried later
+            raise RpcUnavailable(f"getTransaction batch: {error or responses}")
+        self.batches += 1
+        by_id = {response.get('id'): response for response in responses}
+        for request, item in zip(requests, batch):
+            self._resolve(item, by_id.get(request['id']))
+
+    async def _send_single(self, item):
+        try:
+            async with self.slots:
+                response = await self._post(self._request(item[0]))
+        except Exception as e:
+            if not item[1].done():
+                RPC_ERRORS.inc('getTransaction')
+                item[1].set_exception(e)
+            return
+        self._resolve(item, response)
+
+    def _resolve(self, item, response):
+        signature, future, queued_at = item
+        if future.done():
+            return
+        if response is None or 'error' in response:
+            RPC_ERRORS.inc('getTransaction')
+        if response is None:
+            future.set_exception(RpcError(f"No response for transaction {signature}"))
+        elif 'error' in response:
+            future.set_exception(RpcError(f"getTransaction {signature}: {response['error']}"))
+        else:
+            future.set_result(response.get('result'))
+        self._record(time.monotonic() - queued_at)
+
+    def _record(self, latency):
+        self.latencies.append(latency)
+        self.fetched += 1
+        self.window_fetched += 1
+        elapsed = time.monotonic() - self.window_started
+        if elapsed >= FETCH_REPORT_SECONDS:
+            self.report(elapsed)
+
+    def stats(self, elapsed=None):
+        elapsed = elapsed if elapsed is not None else time.monotonic() - self.window_started
+        latencies = sorted(self.latencies)
+        return {
+            'fetched': self.fetched,
+            'batches': self.batches,
+            'batching': self.batch_supported,
+            'throughput_tps': self.window_fetched / elapsed if elapsed > 0 else 0.0,
+            'p50_ms': _percentile(latencies, 0.50) * 1000,
+            'p99_ms': _percentile(latencies, 0.99) * 1000,
+        }
+
+    def report(self, elapsed=None):
+        stats = self.stats(elapsed)
+        mode = 'batched' if stats['batching'] else 'parallel single calls'
+        logger.info(
+            f"Transaction fetch ({mode}): {stats['fetched']} fetched, "
+            f"{stats['throughput_tps']:.1f} tx/s, p50 {stats['p50_ms']:.0f} ms, p99 {stats['p99_ms']:.0f} ms; "
+            f"{connection_reuse_summary()}; endpoints: {self.pool.summary()}"
+        )
+        self.window_started = time.monotonic()
+        self.window_fetched = 0
+        return stats
+
+    async def close(self):
+        # Requests still waiting for their batch window go out now, and finish before the session closes
+        self._flush()
+        await asyncio.gather(*self.send_tasks, return_exceptions=True)
+    
\ No newline at end of file
@@ -0,0 +1,41 @@
+import json
+from collections import namedtuple
+
+# orjson is optional; it decodes large RPC responses several times faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ParsedTransaction = namedtuple(
+    'ParsedTransaction',
+    ['meta', 'block_time', 'account_keys', 'signers', 'instructions', 'inner_instructions'],
+)
+
+
+def loads(data):
+    """Decode raw RPC bytes (or text) with the fastest JSON decoder available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_transaction(txn_dict):
+    """Read the fields the alert scripts use from a raw jsonParsed getTransaction result."""
+    if txn_dict is None:
+        return None
+    message = txn_dict.get('transaction', {}).get('message', {})
+    keys = message.get('accountKeys', [])
+    if keys and isinstance(keys[0], dict):
+        account_keys = [key.get('pubkey') for key in keys]
+        signers = {key.get('pubkey') for key in keys if key.get('signer')}
+    else:
+        # Plain json encoding: the first numRequiredSignatures keys sign
+        account_keys = list(keys)
+        signers = set(account_keys[:message.get('header', {}).get('numRequiredSignatures', 1)])
+    meta = txn_dict.get('meta')
+    inner_instructions = (meta or {}).get('innerInstructions') or []
+    return ParsedTransaction(
+        meta, txn_dict.get('blockTime'), account_keys, signers, message.get('instructions', []), inner_instructions,
+    )
+
@@ -0,0 +1,334 @@
+import os
+import re
+import time
+import asyncio
+from solders.pubkey import Pubkey
+from logStream import LogStream, SOLANA_WS_URL
+from logSetup import get_logger
+from pollScheduler import PollScheduler
+from rpcPool import TRANSIENT_ERRORS
+from startupTimer import startup
+from metrics import (
+    STAGE_SECONDS, SIGNATURES_DEDUPED, SIGNATURES_DROPPED, SIGNATURES_RETRIED, CATCHUP_TRUNCATED,
+    WALLET_LAG, WALLET_LAST_POLL, start_metrics_server,
+)
+
+# Starting poll interval per wallet; it adapts to each wallet's activity from there
+POLL_INTERVAL_SECONDS = float(os.getenv('POLL_INTERVAL_SECONDS', '60'))
+
+# Optional file with one "address[,nickname]" per line, on top of the .env pairs
+WATCH_WALLETS_FILE = os.getenv('WATCH_WALLETS_FILE')
+
+WATCH_WALLET_KEY = re.compile(r'^Watch_Wallet_(\d+)$')
+
+logger = get_logger(__name__)
+
+
+class WatchedWallet:
+    """A watched address and the cursor state kept for it between polls.
+
+    Tens of thousands of these can be alive at once, so instances carry no
+    __dict__ and keep the address as its 32 raw bytes (`key`) next to the
+    base58 text the RPC and the logs use.
+    """
+
+    __slots__ = ('address', 'key', 'nickname', 'last_signature', 'store', 'lock', 'poll_requested')
+
+    def __init__(self, address, nickname='Wallet'):
+        self.address = address
+        self.key = bytes(Pubkey.from_string(address))
+        self.nickname = nickname
+        # Keep track of last processed signature
+        self.last_signature = None
+        # Durable cursor/dedup store, when one is attached
+        self.store = None
+        # Serializes catch-up runs; a run requested while one is active is coalesced
+        self.lock = None
+        self.poll_requested = False
+
+    @property
+    def pubkey(self):
+        return Pubkey(self.key)
+
+    def attach_store(self, store):
+        """Resume from the stored cursor and persist every cursor move from now on."""
+        self.store = store
+        self.last_signature = store.get_cursor(self.address) or self.last_signature
+
+    def is_processed(self, signature):
+        return self.store is not None and self.store.is_seen(self.address, signature)
+
+    def advance(self, signature):
+        self.last_signature = str(signature)
+        if self.store is not None:
+            self.store.mark_seen(self.address, signature)
+            self.store.set_cursor(self.address, signature)
+
+    def mark_processed(self, signature):
+        """Dedup a transaction found outside the address's own signature list, leaving the cursor alone."""
+        if self.store is not None:
+            self.store.mark_seen(self.address, signature)
+
+    def __repr__(self):
+        return f"WatchedWallet({self.address!r}, {self.nickname!r})"
+
+
+def address_key(address):
+    """32-byte key of an address given as base58 text, raw bytes or a Pubkey."""
+    if isinstance(address, bytes):
+        return address
+    if isinstance(address, str):
+        return bytes(Pubkey.from_string(address))
+    return bytes(address)
+
+
+class WatchIndex:
+    """Watched wallets keyed by their 32-byte address.
+
+    Lookups take base58 text, raw key bytes (as sliced from a binary
+    transaction) or a Pubkey. Text is matched against the wallets' own
+    address strings and bytes against their keys, so neither is decoded;
+    parsed blocks hand over every account key as text.
+    """
+
+    __slots__ = ('wallets', 'by_address')
+
+    def __init__(self, wallets=()):
+        self.wallets = {}
+        self.by_address = {}
+        for wallet in wallets:
+            self.add(wallet)
+
+    def add(self, wallet):
+        wallet = self.wallets.setdefault(wallet.key, wallet)
+        self.by_address.setdefault(wallet.address, wallet)
+
+    def get(self, address):
+        if isinstance(address, str):
+            return self.by_address.get(address)
+        return self.wallets.get(address_key(address))
+
+    def __contains__(self, address):
+        return self.get(address) is not None
+
+    def __len__(self):
+        return len(self.wallets)
+
+    def __iter__(self):
+        return iter(self.wallets.values())
+
+    def match(self, account_keys):
+        """The watched wallets among a transaction's account keys, each once, in key order."""
+        matched = []
+        for key in account_keys:
+            wallet = self.get(key)
+            if wallet is not None and wallet not in matched:
+                matched.append(wallet)
+        return matched
+
+
+def _read_wallet_entries():
+    # Watch_Wallet_<n> / Watch_Wallet_<n>_Nickname pairs from the environment
+    numbered = []
+    for key, value in os.environ.items():
+        match = WATCH_WALLET_KEY.match(key)
+        if match and value.strip():
+            nickname = os.getenv(f'{key}_Nickname', 'Wallet')
+            numbered.append((int(match.group(1)), value.strip(), nickname))
+    entries = [(address, nickname) for _, address, nickname in sorted(numbered)]
+
+    if WATCH_WALLETS_FILE:
+        with open(WATCH_WALLETS_FILE) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                address, _, nickname = line.partition(',')
+                entries.append((address.strip(), nickname.strip().strip('"') or 'Wallet'))
+    return entries
+
+
+def load_watched_wallets():
+    index = WatchIndex()
+    for address, nickname in _read_wallet_entries():
+        try:
+            wallet = WatchedWallet(address, nickname)
+        except ValueError as e:
+            logger.warning("Invalid wallet address", extra={'wallet': address, 'error': e})
+            continue
+        index.add(wallet)
+    return list(index)
+
+
+async def _poll_wallet(monitor, wallet, client, bot):
+    if wallet.poll_requested:
+        return  # A queued run will catch up past this activity too
+    if wallet.lock is None:
+        wallet.lock = asyncio.Lock()
+    wallet.poll_requested = True
+    try:
+        await wallet.lock.acquire()
+    finally:
+        # Also when cancelled while queued, or the wallet would never be polled again
+        wallet.poll_requested = False
+    try:
+        await monitor(wallet, client, bot)
+        WALLET_LAST_POLL.set(time.time(), wallet.address)
+        startup.done('first_poll')
+    except Exception:
+        logger.exception("Error monitoring wallet", extra={'wallet': wallet.address})
+    finally:
+        wallet.lock.release()
+
+
+async def _poll_all(monitor, wallets, client, bot):
+    await asyncio.gather(*(_poll_wallet(monitor, wallet, client, bot) for wallet in wallets))
+
+
+async def run_wallet_watcher(monitor, wallets, client, bot, interval=POLL_INTERVAL_SECONDS, ws_url=SOLANA_WS_URL, store=None):
+    """Run `monitor` for every wallet until cancelled.
+
+    With a store, every wallet resumes from its persisted cursor, so
+    transactions that landed during downtime are caught up on the first run.
+
+    With a websocket URL, wallets are caught up when a log notification
+    mentions them, and polling only runs while the socket is down. Polling
+    starts every wallet at `interval` and then adapts it per wallet (see
+    PollScheduler); the shared client caps and paces the RPC calls.
+
+    Pipeline metrics are served on the local /metrics endpoint meanwhile.
+    """
+    if store is not None:
+        for wallet in wallets:
+            wallet.attach_store(store)
+        store.start()
+
+    metrics_server = await start_metrics_server()
+    try:
+        await _watch(monitor, wallets, client, bot, interval, ws_url)
+    finally:
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+
+
+async def _watch(monitor, wallets, client, bot, interval, ws_url):
+    async def poll(wallet):
+        await _poll_wallet(monitor, wallet, client, bot)
+
+    scheduler = PollScheduler(poll, wallets, interval)
+    if not ws_url:
+        await scheduler.run()
+        return
+
+    by_address = {wallet.address: wallet for wallet in wallets}
+    # Catch-ups started by notifications; referenced here so they are not garbage collected mid-run
+    activity_tasks = set()
+
+    async def on_activity(address):
+        task = asyncio.ensure_future(_poll_wallet(monitor, by_address[address], client, bot))
+        activity_tasks.add(task)
+        task.add_done_callback(activity_tasks.discard)
+
+    async def on_connect():
+        await _poll_all(monitor, wallets, client, bot)
+
+    stream = LogStream(ws_url, by_address, on_activity, on_connect)
+    stream_task = asyncio.ensure_future(stream.run())
+    try:
+        while True:
+            if stream.connected.is_set():
+                await stream.disconnected.wait()
+                continue
+            # Poll until the socket is back; the reconnect backfills every wallet anyway
+            polling = asyncio.ensure_future(scheduler.run())
+            try:
+                await stream.connected.wait()
+            finally:
+                polling.cancel()
+    finally:
+        stream_task.cancel()
+        for task in activity_tasks:
+            task.cancel()
+
+
+# Page size for getSignaturesForAddress while catching up (the RPC maximum is 1000)
+SIGNATURE_PAGE_SIZE = int(os.getenv('SIGNATURE_PAGE_SIZE', '1000'))
+
+# Upper bound on how far back a single catch-up walks
+MAX_CATCHUP_SIGNATURES = int(os.getenv('MAX_CATCHUP_SIGNATURES', '5000'))
+
+# How many backlog transactions are fetched concurrently before they are processed
+CATCHUP_CHUNK_SIZE = int(os.getenv('CATCHUP_CHUNK_SIZE', '32'))
+
+
+async def fetch_new_signatures(client, address, until=None, page_size=SIGNATURE_PAGE_SIZE):
+    """Return every signature newer than `until`, oldest first.
+
+    Without a cursor only the newest signature is returned, so a fresh start
+    alerts on the latest transaction instead of the whole history.
+    """
+    if until is None:
+        with STAGE_SECONDS.time('signatures'):
+            response = await client.get_signatures_for_address(address, limit=1)
+        return list(response.value or [])
+
+    signatures = []
+    before = None
+    while len(signatures) < MAX_CATCHUP_SIGNATURES:
+        with STAGE_SECONDS.time('signatures'):
+            response = await client.get_signatures_for_address(address, before=before, until=until, limit=page_size)
+        page = response.value or []
+        signatures.extend(page)
+        if len(page) < page_size:
+            break
+        before = page[-1].signature
+    else:
+        CATCHUP_TRUNCATED.inc()
+        logger.warning("Catch-up stopped; older signatures are skipped",
+                       extra={'wallet': address, 'signatures': len(signatures)})
+
+    signatures.reverse()
+    return signatures
+
+
+async def _timed_fetch(fetch, signature):
+    with STAGE_SECONDS.time('fetch'):
+        return await fetch(signature)
+
+
+async def drain_backlog(wallet, signatures, fetch, process):
+    """Fetch the backlog in concurrent chunks and process it oldest-first, advancing the cursor per transaction.
+
+    A transaction whose fetch or processing fails on the RPC or the network
+    stops the run with the cursor before it, so the next run retries it.
+    """
+    for start in range(0, len(signatures), CATCHUP_CHUNK_SIZE):
+        chunk = signatures[start:start + CATCHUP_CHUNK_SIZE]
+        # Signatures already handled before a restart or by an overlapping run are skipped
+        todo = [info for info in chunk if not wallet.is_processed(info.signature)]
+        if len(todo) < len(chunk):
+            SIGNATURES_DEDUPED.inc(amount=len(chunk) - len(todo))
+        fetched = await asyncio.gather(*(_timed_fetch(fetch, info.signature) for info in todo), return_exceptions=True)
+        results = {str(info.signature): result for info, result in zip(todo, fetched)}
+        for info in chunk:
+            if str(info.signature) in results:
+                result = results[str(info.signature)]
+                try:
+                    if isinstance(result, BaseException):
+                        raise result
+                    if result is None:
+                        SIGNATURES_DROPPED.inc('not_found')
+                    await process(info.signature, result)
+                except TRANSIENT_ERRORS as e:
+                    SIGNATURES_RETRIED.inc()
+                    logger.warning("Transaction will be retried on the next run",
+                                   extra={'wallet': wallet.address, 'signature': str(info.signature), 'error': e})
+                    return
+                except Exception:
+                    SIGNATURES_DROPPED.inc('error')
+                    logger.exception("Error processing transaction",
+                                     extra={'wallet': wallet.address, 'signature': str(info.signature)})
+                block_time = getattr(info, 'block_time', None)
+                if block_time:
+                    WALLET_LAG.set(round(time.time() - block_time, 3), wallet.address)
+            wallet.advance(info.signature)